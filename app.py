@@ -1,24 +1,4 @@
 import streamlit as st
-import pandas as pd
-from streamlit_pdf_viewer import pdf_viewer
-import matplotlib.pyplot as plt
-from datetime import datetime
-import pytz
-import pydeck as pdk
-import os
-from pathlib import Path
-import altair as alt
-import numpy as np
-
-# Set larger font sizes for all matplotlib charts
-plt.rcParams.update({
-    'font.size': 14,
-    'axes.titlesize': 18,
-    'axes.labelsize': 16,
-    'xtick.labelsize': 16,
-    'ytick.labelsize': 16,
-    'legend.fontsize': 14
-})
 
 # Set page config including browser tab title
 st.set_page_config(
@@ -88,8 +68,12 @@ def check_password():
 
     def password_entered():
         """Checks whether a password entered by the user is correct."""
-        if st.session_state["password"] == st.secrets["passwords"]["password"]:
+        # The optional admin password also unlocks the performance panel
+        admin_password = st.secrets["passwords"].get("admin_password")
+        is_admin = bool(admin_password) and st.session_state["password"] == admin_password
+        if is_admin or st.session_state["password"] == st.secrets["passwords"]["password"]:
             st.session_state["password_correct"] = True
+            st.session_state["is_admin"] = is_admin
             del st.session_state["password"]  # Don't store the password.
         else:
             st.session_state["password_correct"] = False
@@ -120,19 +104,43 @@ def check_password():
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
 
-# Define timezone options
-TIMEZONE_OPTIONS = {
-    "UTC": "UTC",
-    "United States (Pacific)": "America/Los_Angeles",
-    "United States (Mountain)": "America/Denver",
-    "United States (Central)": "America/Chicago",
-    "United States (Eastern)": "America/New_York",
-    "Japan": "Asia/Tokyo",
-    "India": "Asia/Kolkata",
-    "United Kingdom": "Europe/London",
-    "European Union (Central)": "Europe/Paris",
-    "Australia (Sydney)": "Australia/Sydney"
-}
+# Everything below runs only once a visitor has signed in, so a cold worker
+# shows the password prompt without importing the data stack. Chart, map and
+# PDF libraries are imported further down, by the sections that use them.
+import tempfile
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from leads import charts, cohorts, communities, countries, cube, dataset, export, ingest, instrument, listing, mapview, pipeline, precompute, regions, scoring
+from leads.timezones import TIMEZONE_OPTIONS
+
+
+@st.cache_resource
+def get_timing_log(trace_memory, json_log):
+    """Section timings from every session, for the admin panel and the JSON log."""
+    if json_log:
+        instrument.enable_json_log()
+    return instrument.TimingLog(trace_memory=trace_memory)
+
+
+instrumentation = st.secrets.get("instrumentation", {})
+timing_log = get_timing_log(instrumentation.get("trace_memory", False), instrumentation.get("json_log", True))
+
+# Timings of the latest run of each section in this session; fragments overwrite their own rows
+st.session_state["section_timings"] = {}
+st.session_state.setdefault("session_tag", uuid.uuid4().hex[:8])
+
+
+def timing_context():
+    return {'latest': st.session_state["section_timings"], 'session': st.session_state["session_tag"]}
+
+
+def section(name):
+    """Records wall time, CPU time and peak memory of the enclosed block."""
+    return timing_log.section(name, **timing_context())
+
 
 # Initialize session state for PDF viewers
 if 'show_pdf1' not in st.session_state:
@@ -160,55 +168,93 @@ with st.sidebar:
             # Add a divider for better visual separation
             st.divider()
 
-st.title("360Camera B2B Sales Leads")
+# Every configured forum; a single one from [data] when there is no [communities] table
+all_communities = communities.communities_from_config(st.secrets)
+if len(all_communities) > 1:
+    community_name = st.sidebar.selectbox(
+        "Community",
+        list(all_communities),
+        format_func=lambda name: all_communities[name].title
+    )
+else:
+    community_name = next(iter(all_communities))
+community = all_communities[community_name]
+
+st.title(community.title)
 
 
 # users_org_data = pd.read_csv("users_org.csv")
 # users_no_org_data = pd.read_csv("no-org.csv")
 # users_no_org2_data = pd.read_csv("no-org2.csv")
 
-# Read data from Google Drive
-file_id_1 = st.secrets["data"]["gdrive_file_id_1"]
-file_id_2 = st.secrets["data"]["gdrive_file_id_2"]
-file_id_3 = st.secrets["data"]["gdrive_file_id_3"]
-
-# Create URLs for each file
-url_1 = f"https://docs.google.com/spreadsheets/d/{file_id_1}/export?format=csv"
-url_2 = f"https://docs.google.com/spreadsheets/d/{file_id_2}/export?format=csv"
-url_3 = f"https://docs.google.com/spreadsheets/d/{file_id_3}/export?format=csv"
-
-# Read the CSV files from Google Drive
-users_org_data = pd.read_csv(url_1)
-users_no_org_data = pd.read_csv(url_2)
-users_no_org2_data = pd.read_csv(url_3)
-
-all_data = pd.concat([users_org_data, users_no_org_data, users_no_org2_data])
-all_data['organization'] = all_data['organization'].replace(
-    ['x', 'a', 'no', 'tests', 'none', ' ', '--', 'none none'], 
-    None
-)
 
-filtered_data = all_data[~all_data['organization'].isin([None])]
+@st.cache_resource
+def get_user_cache(fingerprint, ttl, _community, _timing_log=None):
+    """One refreshing cache per community and process, shared by every browser session.
+
+    Only the community on screen refreshes here; `python -m leads.precompute`
+    refreshes every configured community at once, one worker process each.
+    """
+    return ingest.RefreshingCache(lambda: _community.load(_timing_log), ttl=ttl, initial=_community.store.load)
+
+
+# Read the users from the community's local snapshot, refreshed in the
+# background from the Discourse admin API or Google Drive
+with section("load data"):
+    cached_data, data_version = get_user_cache(community.fingerprint, community.ttl, community, timing_log).get()
+
+# The cached frame is shared across sessions: read from it, never write to it
+all_data = cached_data
+
+
+@st.cache_resource
+def get_chart_cache():
+    """Rendered chart images shared by every session, evicted least recently used first."""
+    return charts.ChartCache()
+
+
+chart_cache = get_chart_cache()
+
 
-# Total number of users
-unique_user_ids = all_data['username'].dropna().nunique() 
+@st.cache_resource(max_entries=2 * len(all_communities))
+def get_dataset(_data, community_name, version, profile_url):
+    """The user table and its indexes for one community's data version, shared by every session."""
+    return dataset.Dataset(_data, version, profile_url)
 
-# Total org
-unique_orgs = filtered_data['organization'].dropna().nunique()
 
+shared = get_dataset(cached_data, community.name, data_version, community.profile_url)
 
-# Total countries
-def extract_countries(location):
-    if isinstance(location, str):
-        parts = location.split(',')
-        if len(parts) == 0:
-            return parts[0]
-        return parts[-1].strip()  # Add strip() to remove any whitespace
-    return None
 
-all_data['country'] = all_data['last_ip_country'].apply(extract_countries)
-users_per_country = all_data.groupby('country')['user_id'].nunique()
-countries = users_per_country.dropna().nunique()
+@st.cache_resource(max_entries=2 * len(all_communities))
+def get_artifacts(_dataset, version, artifact_dir):
+    """Aggregates and metrics for one data version.
+
+    Loaded from the bundle written by `python -m leads.precompute` when one
+    exists for this version (which also pre-fills the chart cache), and
+    computed here otherwise.
+    """
+    bundle = precompute.load_bundle(artifact_dir, version, chart_cache)
+    if bundle is not None:
+        return bundle
+    return pipeline.build_artifacts(_dataset.data, version, _dataset.organizations)
+
+
+with section("artifacts"):
+    artifacts = get_artifacts(shared, data_version, community.artifact_dir)
+data_cube = artifacts.cube
+
+with section("search index"):
+    search_index = shared.search_index
+
+# Map regions: the defaults plus any configured under [regions]
+with section("region partitions"):
+    region_partitions = shared.regions(regions.regions_from_config(st.secrets.get("regions", {})))
+
+# Total number of users, organizations and countries
+unique_user_ids = artifacts.metrics['unique_users']
+unique_orgs = artifacts.metrics['unique_orgs']
+country_total = artifacts.metrics['countries']
+users_per_country = data_cube.users_per_country()
 
 # Writing data
 col1, col2, col3 = st.columns(3)
@@ -231,7 +277,7 @@ col2.markdown(f"""
 col3.markdown(f"""
     <div style='text-align: center; padding: 1rem; border: 1px solid rgba(49, 51, 63, 0.2); border-radius: 0.5rem;'>
         <div style='font-size: 24px; font-weight: 600; margin-bottom: 0.5rem;'>Countries</div>
-        <div style='font-size: 50px; font-weight: 500;'>{int(countries)}</div>
+        <div style='font-size: 50px; font-weight: 500;'>{int(country_total)}</div>
     </div>
 """, unsafe_allow_html=True)
 
@@ -246,17 +292,12 @@ top_countries.columns = ['Country', 'Users']
 # Sort by Users ascending for left-to-right
 top_countries = top_countries.sort_values('Users', ascending=False)
 
-# Replace long country names with abbreviations
-country_replacements = {
-    'United States': 'USA',
-    'United Kingdom': 'UK',
-    'United States of America': 'USA'
-}
-
-# Apply the replacements
-top_countries['Country'] = top_countries['Country'].replace(country_replacements)
+# Label ISO codes with the country table's short names ("USA", "UK")
+top_countries['Country'] = countries.short_names(top_countries['Country'])
 
 # Then create your chart with the modified data
+import altair as alt
+
 chart = alt.Chart(top_countries).mark_bar().encode(
     x=alt.X('Users:Q', axis=alt.Axis(labelFontSize=18)),
     y=alt.Y('Country:N', 
@@ -275,7 +316,8 @@ chart = alt.Chart(top_countries).mark_bar().encode(
     fontWeight=600
 )
 
-st.altair_chart(chart, use_container_width=False)
+with section("top countries chart"):
+    st.altair_chart(chart, use_container_width=False)
 
 # Add the 9 years image at 60% width
 col1, col2, col3 = st.columns([1, 3, 1])
@@ -289,113 +331,126 @@ st.write("9 years of businesses building 360 camera products")
 st.header("B2B Sales Leads by Geo")
 
 
-# Add region filter dropdown
-region_filter = st.selectbox(
-    "Filter by region",
-    ["All Regions", "United States", "European Union", "Japan", "India"]
-)
-
-# Create a dataframe with lat/long and tooltip info for mapping
-map_data = all_data[['last_ip_latitude', 'last_ip_longitude', 'last_ip_country', 
-                     'last_ip_is_eu_member', 'organization', 'last_ip_city', 
-                     'last_ip_state', 'username', 'posts_read']].copy()
-map_data.columns = ['latitude', 'longitude', 'country', 'is_eu', 
-                    'organization', 'city', 'state', 'username', 'posts_read']  # Rename for clarity
-
-# Apply region filters
-if region_filter == "United States":
-    map_data = map_data[map_data['country'].str.contains('United States', case=False, na=False)]
-elif region_filter == "European Union":
-    map_data = map_data[map_data['is_eu'] == True]
-elif region_filter == "Japan":
-    map_data = map_data[map_data['country'].str.contains('Japan', case=False, na=False)]
-elif region_filter == "India":
-    map_data = map_data[map_data['country'].str.contains('India', case=False, na=False)]
-
-# Print debug info
-if region_filter != "All Regions":
-    st.write(f"Debug: Found {len(map_data)} users in {region_filter}")
-
-# Keep all columns for tooltip display
-map_data = map_data.dropna(subset=['latitude', 'longitude'])
-
-# Add organization_html to the data
-map_data['organization_html'] = map_data['organization'].apply(
-    lambda x: f"<b>Organization:</b> {x}<br/>" if pd.notna(x) else ""
-)
-
-# Debugging: Print the number of points
-st.write(f"Debug: Total points in map_data: {len(map_data)}")
-
-# Debugging: Check if DaisukeHohjoh is present in map_data
-daisuke_present = map_data[map_data['username'].str.contains('DaisukeHohjoh', case=False, na=False)]
-st.write(f"Debug: DaisukeHohjoh entries in map_data: {len(daisuke_present)}")
-
-# Add a search box for filtering by username
-username_search = st.text_input("Search by username:")
-
-# Filter map_data based on the search input
-if username_search:
-    map_data = map_data[map_data['username'].str.contains(username_search, case=False, na=False)]
-
-# Debugging: Check the number of entries after filtering
-st.write(f"Debug: Number of entries in map_data after filtering: {len(map_data)}")
-
-# Function to add jitter to latitude and longitude
-def add_jitter(lat, lon, jitter_amount=0.0001):
-    jittered_lat = lat + np.random.uniform(-jitter_amount, jitter_amount)
-    jittered_lon = lon + np.random.uniform(-jitter_amount, jitter_amount)
-    return jittered_lat, jittered_lon
-
-# Apply jitter to map_data
-map_data['latitude'], map_data['longitude'] = zip(*map_data.apply(
-    lambda row: add_jitter(row['latitude'], row['longitude']), axis=1))
+@st.fragment
+@timing_log.timed("map", timing_context)
+def geo_map_section():
+    """Region filter, username search and map; reruns on its own when they change."""
+    import pydeck as pdk
+
+    # Add region filter dropdown
+    region_filter = st.selectbox("Filter by region", region_partitions.names)
+
+    # Region partitions are shared, sorted row ids of users with a location;
+    # this session only narrows its region's rows
+    map_frame = shared.map_frame
+    map_rows = region_partitions.rows(region_filter)
+
+    # Print debug info
+    if region_filter != regions.ALL_REGIONS:
+        st.write(f"Debug: Found {region_partitions.users(region_filter)} users in {region_filter}")
+
+    # Debugging: Print the number of points
+    st.write(f"Debug: Total points in map_data: {len(map_rows)}")
+
+    # Debugging: Check if DaisukeHohjoh is present in map_data
+    daisuke_present = search_index['username'].mask('DaisukeHohjoh', map_rows)
+    st.write(f"Debug: DaisukeHohjoh entries in map_data: {daisuke_present.sum()}")
+
+    # Add a search box for filtering by username
+    username_search = st.text_input("Search by username:")
+
+    # Filter map_data based on the search input
+    if username_search:
+        map_rows = map_rows[search_index['username'].mask(username_search, map_rows)]
+
+    # Debugging: Check the number of entries after filtering
+    st.write(f"Debug: Number of entries in map_data after filtering: {len(map_rows)}")
+
+    # The map does not report its zoom or position back, so the view is picked
+    # here; with too many users only those around it are sent, clustered
+    zoom_label = st.select_slider("Map zoom", list(mapview.ZOOM_LEVELS), value="World")
+    zoom = mapview.ZOOM_LEVELS[zoom_label]
+    center_options = [None] + mapview.top_countries(map_frame, map_rows)
+    center_on = st.selectbox("Center map on", center_options,
+                             format_func=lambda option: "All shown users" if option is None else option[1])
+    map_data, clustered, users_in_view, (latitude, longitude) = mapview.map_payload(
+        map_frame, map_rows, zoom, center_on[0] if center_on else None)
+
+    # Create the deck map
+    view_state = pdk.ViewState(
+        latitude=latitude,
+        longitude=longitude,
+        zoom=zoom,
+        pitch=0
+    )
 
-# Create the deck map
-view_state = pdk.ViewState(
-    latitude=20,
-    longitude=0,
-    zoom=1,
-    pitch=0
-)
+    if clustered:
+        scatter_layer = pdk.Layer(
+            'ScatterplotLayer',
+            map_data,
+            get_position=['longitude', 'latitude'],
+            get_color=[255, 0, 0, 140],
+            get_radius='radius',  # Grows with the users in the cell
+            radius_min_pixels=2,
+            radius_max_pixels=40,
+            pickable=True,
+            auto_highlight=True,
+            highlight_color=[255, 0, 0, 200]
+        )
+        tooltip_html = """
+            <div style="font-size: 18px; font-family: Arial; padding: 10px; background-color: white; border-radius: 5px; box-shadow: 2px 2px 10px rgba(0,0,0,0.3);">
+                <div style="font-weight: bold; margin-bottom: 5px;">{users} users</div>
+                <div style="margin-top: 5px;"><b>Mostly in:</b> {country}</div>
+                <div style="margin-top: 5px;"><b>Posts Read:</b> {posts_read}</div>
+            </div>
+            """
+    else:
+        scatter_layer = pdk.Layer(
+            'ScatterplotLayer',
+            map_data,
+            get_position=['longitude', 'latitude'],
+            get_color=[255, 0, 0, 140],  # Red with some transparency
+            get_radius=10000,  # Base radius in meters
+            radius_min_pixels=1,  # Minimum size in pixels when zoomed out
+            radius_max_pixels=10,  # Maximum size in pixels when zoomed in
+            pickable=True,
+            auto_highlight=True,
+            highlight_color=[255, 0, 0, 200]
+        )
+        tooltip_html = """
+            <div style="font-size: 18px; font-family: Arial; padding: 10px; background-color: white; border-radius: 5px; box-shadow: 2px 2px 10px rgba(0,0,0,0.3);">
+                <div style="font-weight: bold; margin-bottom: 5px;">Username: {username}</div>
+                {organization_html}
+                <div style="margin-top: 5px;"><b>Location:</b> {city}, {state}, {country}</div>
+                <div style="margin-top: 5px;"><b>Posts Read:</b> {posts_read}</div>
+            </div>
+            """
+
+    # Create and display the map
+    deck = pdk.Deck(
+        layers=[scatter_layer],
+        initial_view_state=view_state,
+        map_style='mapbox://styles/mapbox/light-v9',
+        tooltip={
+            "html": tooltip_html,
+            "style": {
+                "z-index": "10000"
+            }
+        }
+    )
 
-scatter_layer = pdk.Layer(
-    'ScatterplotLayer',
-    map_data,
-    get_position=['longitude', 'latitude'],
-    get_color=[255, 0, 0, 140],  # Red with some transparency
-    get_radius=10000,  # Base radius in meters
-    radius_min_pixels=1,  # Minimum size in pixels when zoomed out
-    radius_max_pixels=10,  # Maximum size in pixels when zoomed in
-    pickable=True,
-    auto_highlight=True,
-    highlight_color=[255, 0, 0, 200]
-)
+    with section("map: pydeck"):
+        st.pydeck_chart(deck)
 
-# Create and display the map
-deck = pdk.Deck(
-    layers=[scatter_layer],
-    initial_view_state=view_state,
-    map_style='mapbox://styles/mapbox/light-v9',
-    tooltip={
-        "html": """
-        <div style="font-size: 18px; font-family: Arial; padding: 10px; background-color: white; border-radius: 5px; box-shadow: 2px 2px 10px rgba(0,0,0,0.3);">
-            <div style="font-weight: bold; margin-bottom: 5px;">Username: {username}</div>
-            {organization_html}
-            <div style="margin-top: 5px;"><b>Location:</b> {city}, {state}, {country}</div>
-            <div style="margin-top: 5px;"><b>Posts Read:</b> {posts_read}</div>
-        </div>
-        """,
-        "style": {
-            "z-index": "10000"
-        }
-    }
-)
+    # Show the count of displayed points
+    if clustered:
+        st.caption(f"Showing {users_in_view} of {len(map_rows)} locations in {region_filter} as "
+                   f"{len(map_data)} clusters; zoom in or center on a country to see individual users")
+    else:
+        st.caption(f"Showing {users_in_view} of {len(map_rows)} locations in {region_filter}")
 
-st.pydeck_chart(deck)
 
-# Show the count of displayed points
-st.caption(f"Showing {len(map_data)} locations in {region_filter}")
+geo_map_section()
 
 # Add time-based analysis section
 st.header("360 Camera Developer Registration Trends")
@@ -405,73 +460,61 @@ col1, col2, col3 = st.columns([1, 3, 1])
 with col2:
     st.image("images/400_developers.png", use_container_width=True)
 
-# Convert created_at to datetime
-all_data['created_at'] = pd.to_datetime(all_data['created_at'])
 
-# Get min and max dates for the slider
-min_date = all_data['created_at'].min().to_pydatetime()
-max_date = all_data['created_at'].max().to_pydatetime()
+@st.fragment
+@timing_log.timed("registration trends", timing_context)
+def registration_trends_section():
+    """Date range and granularity controls with the registrations they select."""
+    # Get min and max dates for the slider
+    min_date, max_date = artifacts.date_bounds
 
-# Print date range for debugging
-st.write(f"Data range: {min_date} to {max_date}")
+    # Print date range for debugging
+    st.write(f"Data range: {min_date} to {max_date}")
 
-# Create date range slider
-date_range = st.slider(
-    "Select Date Range",
-    min_value=min_date,
-    max_value=max_date,
-    value=(min_date, max_date),
-    format="YYYY-MM-DD"
-)
+    # Create date range slider
+    date_range = st.slider(
+        "Select Date Range",
+        min_value=min_date,
+        max_value=max_date,
+        value=(min_date, max_date),
+        format="YYYY-MM-DD"
+    )
 
-# Add granularity selector
-granularity = st.radio(
-    "Select Time Granularity",
-    ["Daily", "Monthly"],
-    horizontal=True,
-    index=1  # Set Monthly as default (index 1)
-)
+    # Add granularity selector
+    granularity = st.radio(
+        "Select Time Granularity",
+        cube.GRANULARITIES,
+        horizontal=True,
+        index=cube.GRANULARITIES.index("Monthly")  # Set Monthly as default
+    )
 
-# Filter data based on selected date range
-mask = (all_data['created_at'] >= pd.Timestamp(date_range[0])) & (all_data['created_at'] <= pd.Timestamp(date_range[1]))
-filtered_time_data = all_data[mask]
+    # Two binary searches into the cube's daily prefix sums
+    period_registrations = data_cube.registrations_between(date_range[0], date_range[1])
 
-# Print filtered data info for debugging
-st.write(f"Number of records in selected range: {len(filtered_time_data)}")
+    # Print filtered data info for debugging
+    st.write(f"Number of records in selected range: {period_registrations}")
 
-# Group by date and count registrations based on selected granularity
-if granularity == "Daily":
-    registrations = filtered_time_data.groupby(filtered_time_data['created_at'].dt.date).size()
-    xlabel = "Date"
-else:
-    # For monthly view, use year and month directly
-    registrations = filtered_time_data.groupby([
-        filtered_time_data['created_at'].dt.year,
-        filtered_time_data['created_at'].dt.month
-    ]).size()
-    # Convert multi-index to datetime for proper sorting
-    registrations.index = pd.to_datetime(registrations.index.map(lambda x: f"{x[0]}-{x[1]:02d}-01"))
-    xlabel = "Month"
-
-# Create line chart
-fig, ax = plt.subplots(figsize=(10, 6))
-registrations.plot(kind='line', ax=ax, marker='o')
-plt.title(f'{granularity} Developer Registrations')
-plt.xlabel(xlabel)
-plt.ylabel('Number of Registrations')
-plt.grid(True)
-plt.xticks(rotation=45)
-st.pyplot(fig)
-
-# Print registration counts for debugging
-st.write("Registration counts by period:")
-st.write(registrations)
-
-# Show summary metrics for the selected period
-col1, col2, col3 = st.columns(3)
-col1.metric("Total Registrations in Period", len(filtered_time_data))
-col2.metric("Average Monthly Registrations", round(len(filtered_time_data) / ((max_date - min_date).days / 30), 1))
-col3.metric("Highest Monthly Registrations", registrations.max())
+    # Roll the days up to the selected granularity
+    registrations = data_cube.registrations(date_range[0], date_range[1], granularity)
+
+    # Create line chart
+    st.image(
+        chart_cache.render(*pipeline.registrations_chart(artifacts, date_range[0], date_range[1], granularity)),
+        use_container_width=True
+    )
+
+    # Print registration counts for debugging
+    st.write("Registration counts by period:")
+    st.write(registrations)
+
+    # Show summary metrics for the selected period
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Registrations in Period", period_registrations)
+    col2.metric("Average Monthly Registrations", round(period_registrations / ((max_date - min_date).days / 30), 1))
+    col3.metric("Highest Monthly Registrations", registrations.max())
+
+
+registration_trends_section()
 
 # Additional Analytics Section
 st.header("Additional Analytics")
@@ -481,122 +524,81 @@ col1, col2, col3 = st.columns([1, 3, 1])
 with col2:
     st.image("images/read_logged_in.png", use_container_width=True)
 
+
+@st.fragment
+@timing_log.timed("registration patterns", timing_context)
+def registration_patterns_section():
+    """Timezone picker with the hourly and weekday charts it drives."""
+    # Add timezone selector
+    selected_timezone = st.selectbox(
+        "Select Timezone",
+        list(TIMEZONE_OPTIONS.keys()),
+        index=0
+    )
+
+    # Hourly and day of week distributions from the precomputed histograms
+    st.image(chart_cache.render(*pipeline.hourly_chart(artifacts, selected_timezone)), use_container_width=True)
+    st.image(chart_cache.render(*pipeline.weekday_chart(artifacts, selected_timezone)), use_container_width=True)
+
+
+@st.fragment
+@timing_log.timed("signup cohorts", timing_context)
+def signup_cohorts_section():
+    """Cohort country and value pickers with the heatmap they drive."""
+    cohort_col1, cohort_col2 = st.columns(2)
+    with cohort_col1:
+        cohort_country = st.selectbox(
+            "Cohort country",
+            [cohorts.ALL_COUNTRIES] + artifacts.cohorts.top_countries()
+        )
+    with cohort_col2:
+        cohort_value = st.radio("Cohort value", list(pipeline.COHORT_VALUES), index=1, horizontal=True)
+    st.image(chart_cache.render(*pipeline.cohort_chart(artifacts, cohort_country, cohort_value)),
+             use_container_width=True)
+
+
 # Create tabs for different visualizations
 tab1, tab2, tab3 = st.tabs(["Developer Engagement", "Geographic Distribution", "Registration Patterns"])
 
 with tab1:
-    # User Engagement Analysis
-    st.subheader("Developer Engagement Over Time")
-    
-    # Show total posts read across all time
-    total_posts_read = all_data['posts_read'].sum()
-    st.metric("Total Posts Read (All Time)", f"{total_posts_read:,}")
-    
-    engagement_data = all_data[['created_at', 'posts_read']].copy()
-    engagement_data['created_at'] = pd.to_datetime(engagement_data['created_at'])
-    engagement_data['date'] = engagement_data['created_at'].dt.date
-    
-    # Calculate cumulative posts read over time
-    daily_posts = engagement_data.groupby('date')['posts_read'].sum()
-    cumulative_posts = daily_posts.cumsum()
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
-    cumulative_posts.plot(kind='line', ax=ax, marker='o')
-    plt.title('Cumulative Posts Read Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('Total Posts Read')
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
-
-    # Engagement by Region
-    st.subheader("Engagement by Region")
-    region_engagement = all_data.groupby('country')['posts_read'].mean().sort_values(ascending=False)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    region_engagement.head(10).plot(kind='bar', ax=ax)
-    plt.title('Top 10 Countries by Average Engagement')
-    plt.xlabel('Country')
-    plt.ylabel('Average Posts Read')
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
+    with section("engagement charts"):
+        # User Engagement Analysis
+        st.subheader("Developer Engagement Over Time")
+
+        # Show total posts read across all time
+        total_posts_read = artifacts.metrics['total_posts_read']
+        st.metric("Total Posts Read (All Time)", f"{total_posts_read:,}")
+
+        # Cumulative posts read over time
+        st.image(chart_cache.render(*pipeline.cumulative_posts_chart(artifacts)), use_container_width=True)
+
+        # Signup cohorts by engagement tier (quartiles of posts read)
+        st.subheader("Engagement by Signup Cohort")
+        signup_cohorts_section()
+
+        # Engagement by Region
+        st.subheader("Engagement by Region")
+        st.image(chart_cache.render(*pipeline.region_engagement_chart(artifacts)), use_container_width=True)
 
 with tab2:
-    # Geographic Distribution
-    st.subheader("Registration Density by Country")
-    country_counts = all_data['country'].value_counts()
-    fig, ax = plt.subplots(figsize=(12, 6))
-    country_counts.head(15).plot(kind='bar', ax=ax)
-    plt.title('Top 15 Countries by Registration Count')
-    plt.xlabel('Country')
-    plt.ylabel('Number of Registrations')
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
-    
-    # EU vs Non-EU Distribution
-    st.subheader("EU vs Non-EU Distribution")
-    eu_counts = all_data['last_ip_is_eu_member'].value_counts()
-    fig, ax = plt.subplots(figsize=(8, 6))
-    eu_counts.plot(kind='pie', autopct='%1.1f%%', ax=ax)
-    plt.title('Distribution of EU vs Non-EU Developers')
-    plt.axis('equal')
-    st.pyplot(fig)
-
-    # US States Distribution
-    st.subheader("Top US States Distribution")
-    us_data = all_data[all_data['last_ip_country'] == 'United States']
-    state_counts = us_data['last_ip_state'].value_counts()
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    state_counts.head(15).plot(kind='bar', ax=ax)
-    plt.title('Top 15 US States by Registration Count')
-    plt.xlabel('State')
-    plt.ylabel('Number of Registrations')
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
+    with section("geographic charts"):
+        # Geographic Distribution
+        st.subheader("Registration Density by Country")
+        st.image(chart_cache.render(*pipeline.country_counts_chart(artifacts)), use_container_width=True)
+
+        # EU vs Non-EU Distribution
+        st.subheader("EU vs Non-EU Distribution")
+        st.image(chart_cache.render(*pipeline.eu_chart(artifacts)), use_container_width=True)
+
+        # US States Distribution
+        st.subheader("Top US States Distribution")
+        st.image(chart_cache.render(*pipeline.state_counts_chart(artifacts)), use_container_width=True)
 
 with tab3:
     # Registration Time Analysis
     st.subheader("Registration Time Patterns")
     
-    # Add timezone selector
-    selected_timezone = st.selectbox(
-        "Select Timezone",
-        list(TIMEZONE_OPTIONS.keys()),
-        index=0
-    )
-    
-    # Convert UTC times to selected timezone
-    tz = pytz.timezone(TIMEZONE_OPTIONS[selected_timezone])
-    try:
-        # Try to convert directly if already timezone-aware
-        all_data['local_time'] = all_data['created_at'].dt.tz_convert(tz)
-    except TypeError:
-        # If not timezone-aware, localize to UTC first
-        all_data['local_time'] = all_data['created_at'].dt.tz_localize('UTC').dt.tz_convert(tz)
-    
-    all_data['hour'] = all_data['local_time'].dt.hour
-    all_data['day_of_week'] = all_data['local_time'].dt.day_name()
-    
-    # Hourly distribution
-    hourly_registrations = all_data.groupby('hour').size()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    hourly_registrations.plot(kind='bar', ax=ax)
-    plt.title(f'Registrations by Hour of Day ({selected_timezone})')
-    plt.xlabel(f'Hour ({selected_timezone})')
-    plt.ylabel('Number of Registrations')
-    plt.grid(True)
-    st.pyplot(fig)
-    
-    # Day of week distribution
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily_registrations = all_data.groupby('day_of_week').size().reindex(day_order)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    daily_registrations.plot(kind='bar', ax=ax)
-    plt.title(f'Registrations by Day of Week ({selected_timezone})')
-    plt.xlabel('Day of Week')
-    plt.ylabel('Number of Registrations')
-    plt.grid(True)
-    st.pyplot(fig)
+    registration_patterns_section()
 
 # Add the 700 developers image before B2B Leads Listing
 col1, col2, col3 = st.columns([1, 3, 1])
@@ -605,70 +607,125 @@ with col2:
 
 # Filters section
 st.header("B2B Leads Listing")
-col1, col2, col3 = st.columns(3)
 
-with col1:
-    country_filter = st.text_input("Filter by country:")
 
-with col2:
-    show_only_with_org = st.toggle("Show only entries with organizations")
+@st.fragment
+@timing_log.timed("leads listing", timing_context)
+def leads_listing_section():
+    """Filters, sorting and paging for the leads table."""
+    col1, col2, col3 = st.columns(3)
 
-with col3:
-    exclude_ricoh_oppkey = st.toggle("Exclude Ricoh and Oppkey")
+    with col1:
+        country_filter = st.text_input("Filter by country:")
 
-# Apply filters
-filtered_display = all_data.copy()
+    with col2:
+        show_only_with_org = st.toggle("Show only entries with organizations")
 
-# Apply organization filter if toggle is on
-if show_only_with_org:
-    filtered_display = filtered_display[filtered_display['organization'].notna()]
+    with col3:
+        exclude_ricoh_oppkey = st.toggle("Exclude Ricoh and Oppkey")
 
-# Apply country filter if there's input
-if country_filter:
-    filtered_display = filtered_display[filtered_display['country'].str.lower().str.contains(country_filter.lower(), na=False)]
+    # Apply filters as one row mask
+    keep = np.ones(len(all_data), dtype=bool)
 
-# Exclude Ricoh and Oppkey if toggle is on
-if exclude_ricoh_oppkey:
-    filtered_display = filtered_display[~filtered_display['organization'].str.lower().str.contains('ricoh|oppkey', case=False, na=False)]
+    # Apply organization filter if toggle is on
+    if show_only_with_org:
+        keep &= shared.organizations.present()
 
-# Create a new column for the links
-filtered_display['profile_link'] = filtered_display['username'].apply(
-    lambda x: f"https://community.theta360.guide/u/{x}/summary" if pd.notna(x) else ''
-)
+    # Apply country filter if there's input
+    if country_filter:
+        keep &= search_index['country'].mask(country_filter)
 
-# Remove specified columns
-columns_to_remove = ['user_id', 'Username', 'last_ip_latitude', 'last_ip_longitude', 
-                    'registration_ip_longitude', 'hour', 'day_of_week', 
-                    'registration_ip_latitude']
-filtered_display = filtered_display.drop(columns=columns_to_remove, errors='ignore')
-
-# Reorder columns to show organization, country, state, then name
-remaining_columns = filtered_display.columns.tolist()
-
-# Safely remove columns if they exist
-for col in ['organization', 'country', 'last_ip_state', 'name', 'profile_link']:
-    if col in remaining_columns:
-        remaining_columns.remove(col)
-
-new_column_order = ['organization', 'country', 'last_ip_state', 'name', 'profile_link'] + remaining_columns
-
-filtered_display = filtered_display[new_column_order]
-
-# Display filtered data without index
-st.dataframe(
-    filtered_display, 
-    hide_index=True,
-    column_config={
-        "name": "Name",
-        "last_ip_state": "State",
-        "profile_link": st.column_config.LinkColumn(
-            "Profile",
-            help="Click to view user profile",
-            width="small",
-            display_text="View"
+    # Exclude Ricoh and Oppkey (every spelling of them) if toggle is on
+    if exclude_ricoh_oppkey:
+        keep &= ~shared.organization_rows(listing.EXCLUDED_ORGANIZATIONS)
+
+    filtered_rows = np.flatnonzero(keep)
+    leads_listing = shared.listing
+
+    # Sorting and paging happen on row positions; only the visible page is built
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_column = st.selectbox(
+            "Sort by",
+            [None, listing.RANKED] + leads_listing.columns,
+            format_func=lambda column: {None: "Export order", listing.RANKED: "Lead score (ranked)"}.get(column, column)
         )
-    }
-)
+    with col2:
+        sort_descending = st.toggle("Descending", help="Ranked leads are always best first")
+    with col3:
+        page_size = st.selectbox("Rows per page", listing.PAGE_SIZES, index=1)
+    with col4:
+        page_count = leads_listing.page_count(filtered_rows, page_size)
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+
+    if sort_column == listing.RANKED:
+        # Score every user with the chosen weights, then rank only as far as this page
+        with st.expander("Lead score weights"):
+            weight_columns = st.columns(len(scoring.SIGNALS))
+            weights = {
+                signal: column.slider(signal.title(), 0.0, 1.0, scoring.DEFAULT_WEIGHTS[signal], 0.05)
+                for signal, column in zip(scoring.SIGNALS, weight_columns)
+            }
+            priority_regions = st.multiselect(
+                "Priority regions",
+                region_partitions.names[1:],
+                default=[name for name in scoring.DEFAULT_PRIORITY_REGIONS if name in region_partitions.names]
+            )
+        scores = shared.scorer.scores(weights, [region_partitions.members(name) for name in priority_regions])
+        ranked_rows, ranked_scores = shared.scorer.top(filtered_rows, scores, page_number * page_size)
+        page_data = leads_listing.page(ranked_rows, page_number, page_size)
+        page_data.insert(0, listing.RANKED, ranked_scores[(page_number - 1) * page_size:])
+    else:
+        sorted_rows = leads_listing.sort(filtered_rows, sort_column, ascending=not sort_descending)
+        page_data = leads_listing.page(sorted_rows, page_number, page_size)
+
+    # Display the current page without index
+    st.dataframe(
+        page_data, 
+        hide_index=True,
+        column_config={
+            "name": "Name",
+            "last_ip_state": "State",
+            listing.RANKED: st.column_config.NumberColumn("Score", format="%.3f"),
+            "profile_link": st.column_config.LinkColumn(
+                "Profile",
+                help="Click to view user profile",
+                width="small",
+                display_text="View"
+            )
+        }
+    )
+    st.caption(f"Page {page_number} of {page_count} ({len(filtered_rows)} matching leads)")
+
+    # Export every matching lead in the listing's order, written a chunk at a time
+    with st.expander("Export"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            export_columns = st.multiselect("Columns", leads_listing.columns, default=leads_listing.columns)
+        with col2:
+            export_format = st.selectbox("Format", export.available_formats())
+        st.caption(f"Downloads are limited to {export.MAX_DOWNLOAD_BYTES // 2 ** 20} MB; "
+                   "Parquet is the most compact format.")
+        if st.button("Prepare export", disabled=not export_columns):
+            export_scores = None
+            if sort_column == listing.RANKED:
+                sorted_rows, export_scores = shared.scorer.top(filtered_rows, scores, len(filtered_rows))
+            file_format = export.FORMATS[export_format]
+            try:
+                with section("leads export"), tempfile.TemporaryFile() as file:
+                    export.export(leads_listing, sorted_rows, file, export_format, export_columns, export_scores)
+                    st.download_button(
+                        f"Download {len(filtered_rows)} leads",
+                        export.download_bytes(file),
+                        file_name=f"leads.{file_format['extension']}",
+                        mime=file_format['mime'],
+                        on_click="ignore"
+                    )
+            except ValueError as e:
+                st.error(str(e))
+
+
+leads_listing_section()
 
 # Add the posts read image before Sales Kit Sample
 col1, col2, col3 = st.columns([1, 3, 1])
@@ -678,24 +735,39 @@ with col2:
 # View Reports section
 st.header("Sales Kit Sample")
 
-# Dropdown for report selection
-report_selection = st.selectbox(
-    "Select a report to view",
-    ["Select a report", "360 Camera Sales Kit", "DeveloperWeek Report", "Close viewer"],
-    key="report_selector"
-)
 
-# Handle report selection
-if report_selection == "360 Camera Sales Kit":
-    try:
-        pdf_viewer("reports/camera360-sales.pdf", width=1000)
-    except Exception as e:
-        st.error(f"Error loading PDF: {str(e)}")
-elif report_selection == "DeveloperWeek Report":
-    try:
-        pdf_viewer("reports/360camera-developerweek.pdf", width=1000)
-    except Exception as e:
-        st.error(f"Error loading PDF: {str(e)}")
-elif report_selection == "Close viewer":
-    # This will effectively close the viewer by not showing any PDF
-    pass
+@st.fragment
+@timing_log.timed("sales kit", timing_context)
+def sales_kit_section():
+    """Report picker and PDF viewer."""
+    # Dropdown for report selection
+    report_selection = st.selectbox(
+        "Select a report to view",
+        ["Select a report", "360 Camera Sales Kit", "DeveloperWeek Report", "Close viewer"],
+        key="report_selector"
+    )
+
+    # Handle report selection; "Close viewer" shows no PDF
+    report_files = {
+        "360 Camera Sales Kit": "reports/camera360-sales.pdf",
+        "DeveloperWeek Report": "reports/360camera-developerweek.pdf",
+    }
+    if report_selection in report_files:
+        # Imported on first use, so sessions that never open a report skip it
+        from streamlit_pdf_viewer import pdf_viewer
+        try:
+            pdf_viewer(report_files[report_selection], width=1000)
+        except Exception as e:
+            st.error(f"Error loading PDF: {str(e)}")
+
+
+sales_kit_section()
+
+# Performance panel, only for sessions that signed in with the admin password
+if st.session_state.get("is_admin"):
+    with st.sidebar:
+        with st.expander("Performance"):
+            st.caption("Latest run of each section in this session")
+            st.dataframe(instrument.records_frame(st.session_state["section_timings"].values()), hide_index=True)
+            st.caption(f"All sessions, last {instrument.SAMPLES_PER_SECTION} runs per section")
+            st.dataframe(timing_log.summary())
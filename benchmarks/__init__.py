@@ -0,0 +1 @@
+"""Benchmarks for the dashboard pipeline. Run each module with `python -m`."""
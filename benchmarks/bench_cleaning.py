@@ -0,0 +1,59 @@
+"""Compares the vectorized cleaning stages with the old per-row applies.
+
+    python -m benchmarks.bench_cleaning --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from leads import cleaning, synthetic
+
+# The per-row implementations that used to live in app.py
+def extract_country_per_row(location):
+    if isinstance(location, str):
+        parts = location.split(',')
+        if len(parts) == 0:
+            return parts[0]
+        return parts[-1].strip()
+    return None
+
+
+def add_jitter_per_row(lat, lon, jitter_amount=0.0001):
+    jittered_lat = lat + np.random.uniform(-jitter_amount, jitter_amount)
+    jittered_lon = lon + np.random.uniform(-jitter_amount, jitter_amount)
+    return jittered_lat, jittered_lon
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = synthetic.generate_users(args.rows)
+    print(f"{args.rows:,} synthetic rows")
+
+    old = timed("country: Series.apply", lambda: data['last_ip_country'].apply(extract_country_per_row))
+    new = timed("country: vectorized", lambda: cleaning.extract_countries(data['last_ip_country']))
+    assert old.equals(new), "country extraction differs"
+
+    old = timed("organization: replace", lambda: data['organization'].replace(cleaning.JUNK_ORGANIZATIONS, None))
+    new = timed("organization: vectorized", lambda: cleaning.replace_junk_organizations(data['organization']))
+    assert old.equals(new), "organization cleanup differs"
+
+    timed("jitter: DataFrame.apply(axis=1)", lambda: list(zip(*data.apply(
+        lambda row: add_jitter_per_row(row['last_ip_latitude'], row['last_ip_longitude']), axis=1))))
+    lat, lon = timed("jitter: vectorized", lambda: cleaning.add_jitter(data['last_ip_latitude'], data['last_ip_longitude']))
+    assert np.abs(lat - data['last_ip_latitude']).max() <= 0.0001
+    assert np.abs(lon - data['last_ip_longitude']).max() <= 0.0001
+
+
+if __name__ == "__main__":
+    main()
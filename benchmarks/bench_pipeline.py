@@ -0,0 +1,107 @@
+"""Times and memory-profiles every pipeline stage on synthetic exports.
+
+    python -m benchmarks.bench_pipeline --rows 10000 100000 1000000
+
+Peak memory is the highest allocation traced by tracemalloc while the stage
+runs. That covers NumPy and pandas buffers but not Arrow's own allocator.
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from leads import cleaning, cohorts, cube, export, listing, organizations, scoring, search, synthetic, timezones
+
+
+def measure(func):
+    """Returns (result, seconds, peak MiB) for `func`.
+
+    Tracing slows allocation-heavy code down several times, so the stage
+    runs once untraced for the timing and once more under tracemalloc.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def filter_leads(orgs, index, leads):
+    """The leads listing with every filter on, sorted and paged as in the app."""
+    keep = orgs.present()
+    keep &= index['country'].mask('united')
+    keep &= ~orgs.matching(listing.EXCLUDED_ORGANIZATIONS)
+    rows = leads.sort(np.flatnonzero(keep), 'posts_read', ascending=False)
+    return leads.page(rows, 1, listing.PAGE_SIZES[1])
+
+
+def rank_leads(data, orgs):
+    """Lead score signals plus one ranked first page, as in the app's ranked listing."""
+    scorer = scoring.LeadScorer(data, orgs)
+    scores = scorer.scores(scoring.DEFAULT_WEIGHTS)
+    return scorer.top(np.flatnonzero(orgs.present()), scores, listing.PAGE_SIZES[1])
+
+
+def export_leads(data, format):
+    """Every user exported from the listing to a temporary file; returns the file size."""
+    leads = listing.LeadsListing(data)
+    with tempfile.TemporaryFile() as file:
+        export.export(leads, np.arange(len(data)), file, format)
+        return file.tell()
+
+
+def stages(exports):
+    """Yields (name, func) pairs; each func gets the previous stages' results."""
+    yield 'concat + clean', lambda s: cleaning.clean_users(pd.concat(exports))
+    yield 'country lookup', lambda s: cleaning.canonical_countries(s['raw']['last_ip_country'])
+    yield 'jitter', lambda s: cleaning.add_jitter(s['data']['last_ip_latitude'], s['data']['last_ip_longitude'])
+    yield 'time grouping', lambda s: cube.build_cube(s['data']).registrations(
+        *s['date_bounds'], 'Monthly')
+    yield 'signup cohorts', lambda s: cohorts.build_cohorts(s['data']).matrix(value='share')
+    yield 'timezone histograms', lambda s: timezones.build_histograms(s['data']['created_at'])
+    yield 'organization clusters', lambda s: organizations.normalize_organizations(s['data']['organization'])
+    yield 'search index', lambda s: search.build_search_index(s['data'])
+    yield 'leads filtering', lambda s: filter_leads(
+        s['organization clusters'], s['search index'], listing.LeadsListing(s['data']))
+    yield 'lead scoring', lambda s: rank_leads(s['data'], s['organization clusters'])
+    yield 'export csv', lambda s: export_leads(s['data'], 'CSV')
+    yield 'export parquet', lambda s: export_leads(s['data'], 'Parquet')
+
+
+def run(rows, seed):
+    raw = synthetic.generate_users(rows, seed=seed)
+    exports = synthetic.split_exports(raw)
+    state = {'raw': raw}
+    results = []
+    for name, func in stages(exports):
+        result, elapsed, peak = measure(lambda: func(state))
+        state[name] = result
+        if name == 'concat + clean':
+            state['data'] = result
+            state['date_bounds'] = (result['created_at'].min().date(), result['created_at'].max().date())
+        results.append((name, elapsed, peak))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=list(synthetic.SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'stage':<24} {'seconds':>9} {'peak MiB':>10}")
+    for rows in args.rows:
+        for name, elapsed, peak in run(rows, args.seed):
+            print(f"{rows:>10,}  {name:<24} {elapsed:9.3f} {peak:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Loads sheet exports from a local stand-in for Google Drive and checks the refreshing cache.
+
+    python -m benchmarks.bench_refresh --users 100000 --sheets 3 --delay 0.5
+
+The mock serves synthetic exports as CSV at /<file id>.csv, each response
+held back by `--delay` seconds like a slow download. Against it the script
+checks, and times, the three cases `RefreshingCache` exists for:
+
+- first load: `get()` blocks, downloads every sheet in parallel and returns
+  the cleaned users,
+- stale value: once the TTL has passed, `get()` returns the cached users at
+  once and the edited export shows up after a background refresh,
+- failed refresh: with the server answering 503, `get()` keeps serving the
+  last good users under their old version.
+
+The exit status is 1 when any check fails.
+"""
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from leads import ingest, synthetic
+
+
+class MockSheets(ThreadingHTTPServer):
+    """Serves `files` (file id -> CSV bytes) and counts the requests it answers."""
+
+    daemon_threads = True
+
+    def __init__(self, files, delay=0.0):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.files = files
+        self.delay = delay
+        self.failing = False
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url_template(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/{{file_id}}.csv"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(server.delay)
+        file_id = self.path.strip("/").removesuffix(".csv")
+        if server.failing:
+            return self.reply(503, b"unavailable")
+        if file_id not in server.files:
+            return self.reply(404, b"not found")
+        self.reply(200, server.files[file_id])
+
+    def reply(self, status, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def sheet_files(users, sheets):
+    return {f"sheet{number}": part.to_csv(index=False).encode()
+            for number, part in enumerate(synthetic.split_exports(users, sheets), start=1)}
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=synthetic.SIZES[0])
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds the mock holds back each response")
+    parser.add_argument("--ttl", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users = synthetic.generate_users(args.users, seed=args.seed)
+    server = MockSheets(sheet_files(users, args.sheets), args.delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = ingest.sheet_urls({
+        'export_url_template': server.url_template,
+        **{f"gdrive_file_id_{number}": f"sheet{number}" for number in range(1, args.sheets + 1)},
+    })
+    cache = ingest.RefreshingCache(lambda: ingest.load_users(list(urls)), ttl=args.ttl)
+    failures = []
+
+    def check(name, ok, elapsed, detail=""):
+        print(f"{name:<28} {'ok' if ok else 'FAILED':>6} {elapsed:8.3f}s  {detail}")
+        if not ok:
+            failures.append(name)
+
+    print(f"{'case':<28} {'result':>6} {'get()':>9}")
+
+    # First load: blocks until every sheet is downloaded and cleaned
+    start = time.perf_counter()
+    data, version = cache.get()
+    check("first load", len(data) == args.users, time.perf_counter() - start,
+          f"{len(data):,} users from {server.requests} requests, version {version}")
+
+    # Stale value: served at once while an edited export is fetched in the background
+    edited = users.copy()
+    edited.loc[0, 'posts_read'] = 10 ** 9
+    server.files = sheet_files(edited, args.sheets)
+    time.sleep(args.ttl)
+    start = time.perf_counter()
+    stale, stale_version = cache.get()
+    elapsed = time.perf_counter() - start
+    check("stale value served", stale_version == version and elapsed < args.delay, elapsed,
+          "old version returned without waiting for the download")
+    refreshed = wait_for(lambda: cache.version != version, timeout=30 + 10 * args.delay)
+    data, new_version = cache.get()
+    check("background refresh", refreshed and data['posts_read'].max() == 10 ** 9, 0.0,
+          f"version {version} -> {new_version}")
+
+    # Failed refresh: the last good users stay in place
+    server.failing = True
+    requests = server.requests
+    time.sleep(args.ttl)
+    start = time.perf_counter()
+    cache.get()
+    elapsed = time.perf_counter() - start
+    # A failed refresh marks the cached users fresh again for another TTL
+    wait_for(lambda: server.requests > requests and not cache.is_stale(), timeout=30 + 10 * args.delay)
+    data, failed_version = cache.get()
+    check("failed refresh keeps data", failed_version == new_version and len(data) == args.users, elapsed,
+          f"{server.requests - requests} failed requests, still version {failed_version}")
+
+    server.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Measures how long the dashboard takes to respond to each widget.
+
+    python -m benchmarks.bench_reruns --secrets .streamlit/secrets.toml
+
+Each widget lives in an `st.fragment`, so changing it reruns only that
+section. AppTest always replays the whole script, so both numbers come from
+full runs. "full rerun" is a whole run of the current, refactored script,
+which stands in for what every interaction cost before the sections became
+fragments; the original app did more work per run, so it is a lower bound
+on the old cost rather than a measurement of the original app. "fragment"
+is the time spent inside the widget's own section, which is what an
+interaction costs now, minus a little Streamlit overhead.
+
+Widgets that only show up after another choice (the lead score weights
+appear once leads are sorted by score) list that choice as a setup step.
+"""
+import argparse
+import functools
+import statistics
+import time
+from pathlib import Path
+
+import streamlit
+import toml
+from streamlit.testing.v1 import AppTest
+
+from leads import listing
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+
+RANKED_SORT = [("selectbox", "Sort by", listing.RANKED)]
+
+# (widget kind, label, value to switch to, fragment the widget lives in, setup steps)
+WIDGETS = [
+    ("selectbox", "Filter by region", "Japan", "geo_map_section", []),
+    ("text_input", "Search by username:", "dev", "geo_map_section", []),
+    ("select_slider", "Map zoom", "Country", "geo_map_section", []),
+    ("selectbox", "Center map on", (392, "Japan"), "geo_map_section", []),
+    ("radio", "Select Time Granularity", "Daily", "registration_trends_section", []),
+    ("selectbox", "Cohort country", "Japan", "signup_cohorts_section", []),
+    ("radio", "Cohort value", "Users", "signup_cohorts_section", []),
+    ("selectbox", "Select Timezone", "India", "registration_patterns_section", []),
+    ("text_input", "Filter by country:", "japan", "leads_listing_section", []),
+    ("toggle", "Show only entries with organizations", True, "leads_listing_section", []),
+    ("selectbox", "Sort by", "posts_read", "leads_listing_section", []),
+    ("slider", "Engagement", 0.9, "leads_listing_section", RANKED_SORT),
+    ("slider", "Recency", 0.6, "leads_listing_section", RANKED_SORT),
+    ("multiselect", "Priority regions", ["Japan"], "leads_listing_section", RANKED_SORT),
+    ("selectbox", "Select a report to view", "Close viewer", "sales_kit_section", []),
+]
+
+real_fragment = streamlit.fragment
+fragment_seconds = {}
+
+
+def timed_fragment(func=None, **kwargs):
+    """Stands in for `st.fragment` and records how long each fragment body takes."""
+    def decorate(body):
+        @functools.wraps(body)
+        def timed(*args, **kw):
+            start = time.perf_counter()
+            try:
+                return body(*args, **kw)
+            finally:
+                fragment_seconds[body.__name__] = time.perf_counter() - start
+        return real_fragment(timed, **kwargs)
+    return decorate(func) if func is not None else decorate
+
+
+def widget(app, kind, label):
+    return next(w for w in getattr(app, kind) if w.label == label)
+
+
+def run(app):
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    streamlit.fragment = timed_fragment
+    app = AppTest.from_file(str(APP), default_timeout=args.timeout)
+    for section, values in toml.load(args.secrets).items():
+        app.secrets[section] = values
+    app.session_state["password_correct"] = True
+
+    print(f"{'first run (cold caches)':<48} {run(app):8.3f}s")
+    run(app)
+
+    print("full rerun: a whole run of the refactored script, not of the original app")
+    print(f"{'widget':<48} {'full rerun':>10} {'fragment':>10}")
+    for kind, label, value, fragment, setup in WIDGETS:
+        restore = []
+        for setup_kind, setup_label, setup_value in setup:
+            restore.append((setup_kind, setup_label, widget(app, setup_kind, setup_label).value))
+            widget(app, setup_kind, setup_label).set_value(setup_value)
+            run(app)
+        original = widget(app, kind, label).value
+        full, partial = [], []
+        for i in range(args.repeat):
+            widget(app, kind, label).set_value(value if i % 2 == 0 else original)
+            full.append(run(app))
+            partial.append(fragment_seconds[fragment])
+        print(f"{label:<48} {statistics.median(full):9.3f}s {statistics.median(partial):9.3f}s")
+        widget(app, kind, label).set_value(original)
+        for setup_kind, setup_label, setup_value in reversed(restore):
+            widget(app, setup_kind, setup_label).set_value(setup_value)
+        run(app)
+
+
+if __name__ == "__main__":
+    main()
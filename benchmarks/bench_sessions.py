@@ -0,0 +1,59 @@
+"""Measures how memory grows with the number of open dashboard sessions.
+
+    python -m benchmarks.bench_sessions --secrets .streamlit/secrets.toml --sessions 1 10 50
+
+Every session runs the app once and stays alive, like browser tabs left
+open. Memory is what tracemalloc sees as live after each batch, which
+includes NumPy and pandas buffers but not Arrow's allocator.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+
+import toml
+from streamlit.testing.v1 import AppTest
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def open_session(secrets, timeout):
+    app = AppTest.from_file(str(APP), default_timeout=timeout)
+    for section, values in secrets.items():
+        app.secrets[section] = values
+    app.session_state["password_correct"] = True
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    secrets = toml.load(args.secrets)
+    # The first session fills the process-wide caches before tracing starts
+    sessions = [open_session(secrets, args.timeout)]
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    print(f"{'sessions':>8} {'live MiB':>10} {'per session':>12} {'seconds':>9}")
+    for target in sorted(args.sessions):
+        start = time.perf_counter()
+        while len(sessions) < target:
+            sessions.append(open_session(secrets, args.timeout))
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        live = (tracemalloc.get_traced_memory()[0] - baseline) / 2 ** 20
+        per_session = live / max(len(sessions) - 1, 1)
+        print(f"{len(sessions):>8} {live:10.1f} {per_session:12.2f} {elapsed:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
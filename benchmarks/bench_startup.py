@@ -0,0 +1,119 @@
+"""Measures the cold start of the dashboard up to the password prompt.
+
+    python -m benchmarks.bench_startup --runs 5 --budget 1.0
+    python -m benchmarks.bench_startup --secrets .streamlit/secrets.toml --json
+
+Every run is a fresh interpreter, like a newly started Streamlit worker, so
+nothing is imported yet. It reports the time to import Streamlit, the first
+script run up to the password prompt, and which heavy modules that run
+imported; none of them should be needed before a visitor signs in. With
+`--secrets`, the first signed-in run is timed too (loading the data and
+every chart library the dashboard uses).
+
+The exit status is 1 when the median time to the password prompt, Streamlit
+import included, is over `--budget` seconds, so the number can be tracked
+by CI.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+ROOT = APP.parent
+
+PASSWORD_LABEL = "Please enter the password"
+# Modules a visitor who never signs in should not pay for
+HEAVY_MODULES = ['matplotlib', 'pydeck', 'altair', 'streamlit_pdf_viewer', 'pyarrow', 'leads']
+DEFAULT_BUDGET_SECONDS = 1.0
+
+
+def measure(secrets_path, timeout):
+    """One cold start in this process: returns the timings and the heavy modules imported."""
+    start = time.perf_counter()
+    import streamlit  # noqa: F401
+    imported = time.perf_counter()
+
+    from streamlit.testing.v1 import AppTest
+    before = set(sys.modules)
+    app = AppTest.from_file(str(APP), default_timeout=timeout)
+    run_start = time.perf_counter()
+    app.run()
+    prompt = time.perf_counter()
+    if app.exception:
+        raise RuntimeError(app.exception)
+    if not any(w.label == PASSWORD_LABEL for w in app.text_input):
+        raise RuntimeError("the first run did not show the password prompt")
+    loaded = {name.split('.')[0] for name in set(sys.modules) - before}
+
+    result = {
+        'import_streamlit': imported - start,
+        'password_prompt': prompt - run_start,
+        'to_prompt': imported - start + prompt - run_start,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in loaded],
+    }
+    if secrets_path:
+        import toml
+        signed_in = AppTest.from_file(str(APP), default_timeout=timeout)
+        for section, values in toml.load(secrets_path).items():
+            signed_in.secrets[section] = values
+        signed_in.session_state["password_correct"] = True
+        run_start = time.perf_counter()
+        signed_in.run()
+        result['signed_in_run'] = time.perf_counter() - run_start
+        if signed_in.exception:
+            raise RuntimeError(signed_in.exception)
+    return result
+
+
+def cold_start(secrets_path, timeout):
+    """Runs `measure` in a fresh interpreter; also returns the process's wall time."""
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--timeout", str(timeout)]
+    if secrets_path:
+        command += ["--secrets", secrets_path]
+    start = time.perf_counter()
+    child = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="seconds allowed to the password prompt, median (default: %(default)s)")
+    parser.add_argument("--secrets", default=None, help="also time the first signed-in run with these secrets")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", action="store_true", help="print the medians as one JSON line")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.secrets, args.timeout)))
+        return 0
+
+    runs = [cold_start(args.secrets, args.timeout) for _ in range(args.runs)]
+    timings = [name for name in ['import_streamlit', 'password_prompt', 'to_prompt', 'signed_in_run', 'process']
+               if name in runs[0]]
+    medians = {name: statistics.median(run[name] for run in runs) for name in timings}
+    heavy = sorted({name for run in runs for name in run['heavy_modules']})
+    over_budget = medians['to_prompt'] > args.budget
+
+    if args.json:
+        print(json.dumps({**medians, 'heavy_modules': heavy, 'budget': args.budget, 'runs': args.runs,
+                          'over_budget': over_budget}))
+    else:
+        print(f"{'median of ' + str(args.runs) + ' cold starts':<32} {'seconds':>8}")
+        for name in timings:
+            print(f"{name.replace('_', ' '):<32} {medians[name]:8.3f}")
+        print(f"heavy modules before sign-in: {', '.join(heavy) or 'none'}")
+        print(f"budget {args.budget:.3f}s to the password prompt: {'OVER' if over_budget else 'ok'}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Syncs from a local mock of the Discourse admin user list, full then incremental.
+
+    python -m benchmarks.bench_sync --users 100000 --new 500 --fail-rate 0.05
+
+The mock serves synthetic users 100 per page, oldest first, and answers a
+share of requests with 503 to exercise the retries. Each sync reports its
+requests, bytes sent and time, so an incremental refresh can be checked to
+transfer only the pages holding new users.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from leads import discourse, synthetic
+from leads.snapshot import SnapshotStore
+
+
+def api_records(users):
+    """Synthetic export rows as admin API user records."""
+    records = users.rename(columns={v: k for k, v in discourse.FIELDS.items()})
+    records['created_at'] = (pd.to_datetime(records['created_at'], utc=True)
+                             .dt.strftime('%Y-%m-%dT%H:%M:%S.000Z'))
+    return json.loads(records.to_json(orient='records'))
+
+
+class MockDiscourse(ThreadingHTTPServer):
+    """Serves `records` as /admin/users/list/active.json and counts what it sends."""
+
+    daemon_threads = True
+
+    def __init__(self, records, fail_rate=0.0, api_key="test"):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.records = records
+        self.fail_rate = fail_rate
+        self.api_key = api_key
+        self.requests = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_counts(self):
+        self.requests = self.failures = self.bytes_sent = 0
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path != discourse.USER_LIST_PATH.format(user_list="active"):
+            return self.reply(404, {"errors": ["not found"]})
+        if self.headers.get("Api-Key") != server.api_key:
+            return self.reply(403, {"errors": ["invalid api key"]})
+        with server.lock:
+            server.requests += 1
+            fail = random.random() < server.fail_rate
+            server.failures += fail
+        if fail:
+            return self.reply(503, {"errors": ["try again"]})
+        page = max(int(parse_qs(url.query).get("page", ["1"])[0]), 1)
+        start = (page - 1) * discourse.PAGE_SIZE
+        self.reply(200, server.records[start:start + discourse.PAGE_SIZE])
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.server.lock:
+            self.server.bytes_sent += len(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed_sync(server, store, workers):
+    server.reset_counts()
+    start = time.perf_counter()
+    with discourse.DiscourseClient(server.base_url, server.api_key, "system", workers=workers) as client:
+        data, version = discourse.sync_users(client, store)
+    elapsed = time.perf_counter() - start
+    return len(data), version, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=synthetic.SIZES[0])
+    parser.add_argument("--new", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=discourse.DEFAULT_WORKERS)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    users = synthetic.generate_users(args.users + args.new, seed=args.seed)
+    server = MockDiscourse(api_records(users.iloc[:args.users]), args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'sync':<12} {'rows':>10} {'requests':>9} {'retried':>8} {'KiB sent':>10} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        store = SnapshotStore(snapshot_dir)
+        for name in ["full", "unchanged", "incremental"]:
+            if name == "incremental":
+                server.records = api_records(users)
+            rows, version, elapsed = timed_sync(server, store, args.workers)
+            print(f"{name:<12} {rows:>10,} {server.requests:>9} {server.failures:>8} "
+                  f"{server.bytes_sent / 1024:>10.0f} {elapsed:>8.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Data pipeline behind the 360 Camera B2B sales leads dashboard."""
@@ -0,0 +1,94 @@
+"""Rendering matplotlib charts to cached image bytes.
+
+Charts are drawn on standalone `Figure` objects rather than through pyplot,
+so no figure manager holds on to them, and each figure is cleared as soon as
+its image is saved. Rendered images are kept in an LRU cache keyed by the
+data version and chart parameters, so a rerun that changes nothing does no
+matplotlib work at all. matplotlib itself is imported on the first render,
+so a process that only serves cached or precomputed images never loads it.
+
+`CHART_STYLE` is applied to matplotlib's global rcParams once, at that first
+import, rather than around each render: sessions render in their own
+threads, and a temporary style context leaving in one thread would reset
+the fonts of a chart another thread is still drawing.
+"""
+import io
+import threading
+
+from cachetools import LRUCache
+
+# Larger font sizes for all matplotlib charts
+CHART_STYLE = {
+    'font.size': 14,
+    'axes.titlesize': 18,
+    'axes.labelsize': 16,
+    'xtick.labelsize': 16,
+    'ytick.labelsize': 16,
+    'legend.fontsize': 14
+}
+
+DEFAULT_MAX_CHARTS = 128
+# Same resolution st.pyplot uses
+DEFAULT_DPI = 200
+
+_style_lock = threading.Lock()
+_styled = False
+
+
+def use_chart_style():
+    """Imports matplotlib and applies `CHART_STYLE` to it, once per process."""
+    global _styled
+    with _style_lock:
+        if not _styled:
+            import matplotlib
+            matplotlib.rcParams.update(CHART_STYLE)
+            _styled = True
+
+
+def render_figure(draw, figsize=(10, 6), format="png", dpi=DEFAULT_DPI):
+    """Draws a chart with `draw(ax)` and returns the saved image bytes."""
+    use_chart_style()
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    try:
+        ax = fig.subplots()
+        draw(ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=format, dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+class ChartCache:
+    """Thread-safe LRU cache of rendered chart images."""
+
+    def __init__(self, maxsize=DEFAULT_MAX_CHARTS):
+        self._images = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, key):
+        with self._lock:
+            return self._images.get(key)
+
+    def put(self, key, image):
+        with self._lock:
+            self._images[key] = image
+
+    def render(self, key, draw, figsize=(10, 6), format="png"):
+        """Returns the cached image for `key`, rendering it with `draw` on a miss.
+
+        `key` should identify everything the chart depends on, typically the
+        chart name, the data version and the widget values used to draw it.
+        """
+        key = (key, format)
+        image = self.get(key)
+        if image is not None:
+            return image
+        image = render_figure(draw, figsize=figsize, format=format)
+        self.put(key, image)
+        return image
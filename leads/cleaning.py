@@ -0,0 +1,113 @@
+"""Cleaning steps applied to the concatenated user exports.
+
+Every step works on whole columns at once so the cost stays in pandas and
+NumPy rather than in a Python call per row.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from leads import countries
+from leads.schema import apply_schema
+
+logger = logging.getLogger(__name__)
+
+# Placeholder answers people type into the organization field
+JUNK_ORGANIZATIONS = ['x', 'a', 'no', 'tests', 'none', ' ', '--', 'none none']
+
+COUNTRY_NAMES = set(countries.COUNTRY_DTYPE.categories)
+
+# Unmatched locations named in the ingestion warning, most users first
+UNMATCHED_SHOWN = 20
+
+# Seed for the map jitter, fixed so points don't move between reruns
+JITTER_SEED = 360
+
+
+def replace_junk_organizations(organization, junk=JUNK_ORGANIZATIONS):
+    """Replaces placeholder organization names with None."""
+    return organization.where(~organization.isin(junk), None)
+
+
+def extract_countries(location):
+    """Returns the last comma-separated part of each location, stripped.
+
+    Missing or non-text locations become None. Locations repeat heavily, so
+    the split runs once per distinct value and is mapped back by code.
+    """
+    codes, uniques = pd.factorize(location)
+    uniques = pd.Series(uniques, dtype=object)
+    countries = uniques.str.rsplit(',', n=1).str[-1].str.strip()
+    countries = countries.where(countries.notna(), None).to_numpy(dtype=object)
+    result = np.empty(len(codes), dtype=object)
+    result[:] = None
+    known = codes >= 0
+    result[known] = countries[codes[known]]
+    return pd.Series(result, index=location.index, name=location.name)
+
+
+def canonical_countries(location):
+    """The country of each location as a display name from the country table.
+
+    The whole location is looked up first, so names with a comma such as
+    "Korea, Republic of" are kept; otherwise its last comma-separated part.
+    Locations that match no country become missing and are logged as a
+    warning with their user counts, so the table can be given the spelling.
+    Each distinct location is looked up once and mapped back by code.
+    """
+    codes, uniques = pd.factorize(location)
+    uniques = pd.Series(uniques, dtype=object)
+    whole = countries.iso_codes(uniques)
+    last = countries.iso_codes(extract_countries(uniques))
+    matched = np.r_[np.where(whole != countries.UNKNOWN, whole, last), countries.UNKNOWN]
+    unmatched = np.flatnonzero(matched[:-1] == countries.UNKNOWN)
+    if len(unmatched):
+        log_unmatched(uniques[unmatched], np.bincount(codes[codes >= 0], minlength=len(uniques))[unmatched])
+    return countries.categorical(matched[codes], location.index, location.name)
+
+
+def log_unmatched(locations, users):
+    """Warns about locations that match no country in the table."""
+    counts = pd.Series(users, index=locations.to_numpy()).sort_values(ascending=False, kind='stable')
+    shown = ", ".join(f"{location!r} ({count})" for location, count in counts.head(UNMATCHED_SHOWN).items())
+    more = f" and {len(counts) - UNMATCHED_SHOWN} more" if len(counts) > UNMATCHED_SHOWN else ""
+    logger.warning("%d users in %d locations match no country in countries.csv: %s%s",
+                   counts.sum(), len(counts), shown, more)
+
+
+def refresh_countries(data):
+    """Re-derives `country` when it holds names outside the country table.
+
+    Tables cleaned before countries were matched against the table, such as
+    older snapshots, still have the raw last part of each location.
+    """
+    if 'country' not in data:
+        return data
+    country = data['country']
+    if isinstance(country.dtype, pd.CategoricalDtype) and set(country.cat.categories) <= COUNTRY_NAMES:
+        return data
+    data = data.copy(deep=False)
+    data['country'] = canonical_countries(data['last_ip_country'])
+    return data
+
+
+def add_jitter(latitude, longitude, jitter_amount=0.0001, seed=JITTER_SEED):
+    """Returns latitude/longitude arrays nudged by a seeded uniform jitter.
+
+    Spreads users that share an IP location so they can be picked
+    individually on the map. The same seed and input length always give the
+    same offsets.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = rng.uniform(-jitter_amount, jitter_amount, size=(2, len(latitude)))
+    return np.asarray(latitude) + offsets[0], np.asarray(longitude) + offsets[1]
+
+
+def clean_users(data, junk=JUNK_ORGANIZATIONS):
+    """Returns a cleaned, typed copy of the concatenated user exports."""
+    data = data.reset_index(drop=True)
+    data['organization'] = replace_junk_organizations(data['organization'], junk)
+    data['country'] = canonical_countries(data['last_ip_country'])
+    data['created_at'] = pd.to_datetime(data['created_at'], utc=True)
+    return apply_schema(data)
@@ -0,0 +1,146 @@
+"""Signup cohorts by registration month and engagement tier.
+
+Users are bucketed by the month of `created_at` and by a `posts_read` tier,
+the tiers being the quartiles of posts read over every user. One
+`np.bincount` over the combined (country, month, tier) cell number counts
+every cell at once, a second one sums posts read, and the cohort × tier
+matrix of all users or of one country is a slice or a sum of that array.
+Countries are grouped by ISO code and named from the country table.
+Users without a registration date are left out; a missing `posts_read`
+counts as no posts read, as in the lead score.
+"""
+import numpy as np
+import pandas as pd
+
+from leads import countries
+from leads.timezones import epoch_seconds
+
+TIER_NAMES = ("Low", "Moderate", "High", "Top")
+# Name of the breakdown over every country, and of users without a country
+ALL_COUNTRIES = "All countries"
+UNKNOWN_COUNTRY = "Unknown"
+
+
+def tier_edges(posts_read, tiers=len(TIER_NAMES)):
+    """Upper bounds of every tier but the last: the posts read at each quantile."""
+    if not len(posts_read):
+        return np.zeros(tiers - 1, dtype=np.int64)
+    quantiles = np.arange(1, tiers) / tiers
+    return np.quantile(posts_read, quantiles, method='inverted_cdf').astype(np.int64)
+
+
+def tier_labels(edges):
+    """Tier names with their posts read range, e.g. "High (12–40)"; ties between quantiles leave a tier empty."""
+    lows = np.r_[0, edges + 1]
+    highs = np.r_[edges, -1]
+    labels = []
+    for name, low, high in zip(TIER_NAMES, lows, highs):
+        if high < 0:
+            labels.append(f"{name} ({low}+)")
+        elif low > high:
+            labels.append(f"{name} (none)")
+        else:
+            labels.append(f"{name} ({low}–{high})" if low < high else f"{name} ({low})")
+    return labels
+
+
+def build_cohorts(data):
+    """Counts users and posts read per country, registration month and engagement tier."""
+    known = data['created_at'].notna().to_numpy()
+    months = epoch_seconds(data['created_at']).astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    posts = data['posts_read'].to_numpy(dtype=np.int64, na_value=0)[known]
+    codes = countries.iso_codes(data['country'])[known]
+    present = np.flatnonzero(np.bincount(codes, minlength=countries.MAX_CODE))
+    present = present[present != countries.UNKNOWN]
+    names = list(countries.names(present))
+    # Slot of each code; users without a country go to the last slot
+    slots = np.full(countries.MAX_CODE, len(present), dtype=np.int64)
+    slots[present] = np.arange(len(present))
+    codes = slots[codes]
+
+    edges = tier_edges(posts)
+    tiers = np.searchsorted(edges, posts, side='left')
+    first = months.min() if len(months) else 0
+    months -= first
+    shape = (len(names) + 1, (months.max() + 1) if len(months) else 0, len(TIER_NAMES))
+    cells = (codes * shape[1] + months) * shape[2] + tiers
+    size = int(np.prod(shape))
+    return Cohorts(
+        np.arange(shape[1]) + np.datetime64(int(first), 'M'),
+        edges,
+        np.bincount(cells, minlength=size).reshape(shape),
+        np.bincount(cells, weights=posts, minlength=size).astype(np.int64).reshape(shape),
+        names + [UNKNOWN_COUNTRY],
+    )
+
+
+class Cohorts:
+    """Users and posts read per country × registration month × engagement tier."""
+
+    def __init__(self, months, edges, users, posts_read, country_names):
+        self.months = months
+        self.edges = edges
+        self.users = users
+        self.posts_read = posts_read
+        self.countries = country_names
+        self.tier_labels = tier_labels(edges)
+
+    def _cells(self, values, country):
+        if country is None or country == ALL_COUNTRIES:
+            return values.sum(axis=0)
+        return values[self.countries.index(country)]
+
+    def top_countries(self, n=20):
+        """The `n` countries with the most users, largest first, without the unknown slot."""
+        totals = self.users[:-1].sum(axis=(1, 2))
+        order = np.argsort(-totals, kind='stable')[:n]
+        return [self.countries[i] for i in order if totals[i] > 0]
+
+    def matrix(self, country=None, value='users'):
+        """Cohort × tier table for every country or one of them.
+
+        `value` is 'users', 'share' (each tier's fraction of its cohort) or
+        'posts_read' (mean posts read per user of the cell). Months without
+        registrations are dropped.
+        """
+        users = self._cells(self.users, country)
+        if value == 'users':
+            values = users
+        else:
+            numerator = self._cells(self.posts_read, country) if value == 'posts_read' else users
+            denominator = users if value == 'posts_read' else users.sum(axis=1, keepdims=True)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+        occupied = users.sum(axis=1) > 0
+        return pd.DataFrame(
+            values[occupied],
+            index=pd.PeriodIndex(self.months[occupied], freq='M'),
+            columns=self.tier_labels,
+        )
+
+    def to_frame(self):
+        """The occupied cells as a long table, for writing to a bundle."""
+        country, month, tier = np.nonzero(self.users)
+        return pd.DataFrame({
+            'country': np.asarray(self.countries, dtype=object)[country],
+            'month': self.months[month].astype('datetime64[ns]'),
+            'tier': tier.astype(np.int8),
+            'users': self.users[country, month, tier],
+            'posts_read': self.posts_read[country, month, tier],
+        })
+
+    @classmethod
+    def from_frame(cls, frame, edges):
+        """Rebuilds the cohorts written by `to_frame`."""
+        names = sorted(set(frame['country']) - {UNKNOWN_COUNTRY}) + [UNKNOWN_COUNTRY]
+        month = frame['month'].to_numpy().astype('datetime64[M]')
+        first = month.min() if len(month) else np.datetime64(0, 'M')
+        months = np.arange(first, month.max() + 1 if len(month) else first)
+        shape = (len(names), len(months), len(TIER_NAMES))
+        index = (pd.Index(names).get_indexer(frame['country']), (month - first).astype(np.int64),
+                 frame['tier'].to_numpy())
+        users = np.zeros(shape, dtype=np.int64)
+        posts_read = np.zeros(shape, dtype=np.int64)
+        users[index] = frame['users'].to_numpy()
+        posts_read[index] = frame['posts_read'].to_numpy()
+        return cls(months, np.asarray(edges, dtype=np.int64), users, posts_read, names)
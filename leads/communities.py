@@ -0,0 +1,116 @@
+"""Settings for each forum the dashboard covers, and loading several at once.
+
+A community has its own data source, junk organization names, profile URL
+template and snapshot directory. They are configured as tables under
+`[communities]` in secrets:
+
+    [communities.theta360]
+    title = "360Camera B2B Sales Leads"
+    profile_url = "https://community.theta360.guide/u/{username}/summary"
+    gdrive_file_ids = ["...", "...", "..."]
+
+    [communities.example]
+    junk_organizations = ["n/a", "student"]    # dropped on top of the defaults
+    ttl_seconds = 300                           # defaults to [data] ttl_seconds
+    discourse = { base_url = "https://forum.example.com", api_key = "...", api_username = "system" }
+
+Without a `[communities]` table there is a single community built from
+`[data]` and `[discourse]`. `python -m leads.precompute` builds one community
+per worker process, so refreshing several forums uses several cores instead
+of taking turns on one.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from leads import cleaning, discourse, ingest, listing
+from leads.snapshot import SnapshotStore
+
+DEFAULT_NAME = "default"
+DEFAULT_TITLE = "360Camera B2B Sales Leads"
+DEFAULT_SNAPSHOT_DIR = ".cache/snapshot"
+DEFAULT_ARTIFACT_DIR = "artifacts"
+
+COMMUNITY_KEYS = {'title', 'profile_url', 'gdrive_file_ids', 'discourse', 'junk_organizations',
+                  'snapshot_dir', 'artifact_dir', 'ttl_seconds'}
+
+
+class Community:
+    """One forum: where its users come from and how its leads are cleaned and linked."""
+
+    def __init__(self, name, title=DEFAULT_TITLE, sheet_urls=(), discourse=None, junk_organizations=(),
+                 profile_url=listing.PROFILE_URL, snapshot_dir=DEFAULT_SNAPSHOT_DIR,
+                 artifact_dir=DEFAULT_ARTIFACT_DIR, ttl=ingest.DEFAULT_TTL_SECONDS):
+        self.name = name
+        self.title = title
+        self.sheet_urls = tuple(sheet_urls)
+        self.discourse = dict(discourse) if discourse else None
+        self.junk = list(cleaning.JUNK_ORGANIZATIONS) + [o for o in junk_organizations
+                                                         if o not in cleaning.JUNK_ORGANIZATIONS]
+        self.profile_url = profile_url
+        self.snapshot_dir = snapshot_dir
+        self.artifact_dir = artifact_dir
+        # Seconds before the app refreshes the users in the background
+        self.ttl = ttl
+
+    @property
+    def store(self):
+        return SnapshotStore(self.snapshot_dir)
+
+    @property
+    def fingerprint(self):
+        """Every setting as one string, for cache keys that must change with the configuration."""
+        return json.dumps(vars(self), sort_keys=True, default=str)
+
+    def load(self, timing_log=None):
+        """Refreshes the snapshot from the community's source; returns `(data, version)`."""
+        if self.discourse:
+            with discourse.client_from_config(self.discourse) as client:
+                return discourse.sync_users(client, self.store, timing_log, self.junk)
+        return ingest.load_users(list(self.sheet_urls), self.store, timing_log=timing_log, junk=self.junk)
+
+
+def communities_from_config(secrets):
+    """The configured communities by name, in configuration order."""
+    data = secrets.get("data", {})
+    snapshot_dir = data.get("snapshot_dir", DEFAULT_SNAPSHOT_DIR)
+    artifact_dir = data.get("artifact_dir", DEFAULT_ARTIFACT_DIR)
+    ttl = data.get("ttl_seconds", ingest.DEFAULT_TTL_SECONDS)
+    configured = secrets.get("communities")
+    if not configured:
+        return {DEFAULT_NAME: Community(
+            DEFAULT_NAME,
+            sheet_urls=ingest.sheet_urls(data),
+            discourse=secrets.get("discourse"),
+            snapshot_dir=snapshot_dir,
+            artifact_dir=artifact_dir,
+            ttl=ttl,
+        )}
+
+    template = data.get("export_url_template", ingest.SHEET_EXPORT_URL)
+    communities = {}
+    for name, config in configured.items():
+        unknown = set(config) - COMMUNITY_KEYS
+        if unknown:
+            raise ValueError(f"Community {name!r} has unknown keys: {', '.join(sorted(unknown))}")
+        if not config.get("gdrive_file_ids") and not config.get("discourse"):
+            raise ValueError(f"Community {name!r} needs gdrive_file_ids or discourse settings")
+        communities[name] = Community(
+            name,
+            title=config.get("title", name),
+            sheet_urls=[ingest.sheet_export_url(file_id, template) for file_id in config.get("gdrive_file_ids", [])],
+            discourse=config.get("discourse"),
+            junk_organizations=config.get("junk_organizations", ()),
+            profile_url=config.get("profile_url", listing.PROFILE_URL),
+            snapshot_dir=config.get("snapshot_dir", os.path.join(snapshot_dir, name)),
+            artifact_dir=config.get("artifact_dir", os.path.join(artifact_dir, name)),
+            ttl=config.get("ttl_seconds", ttl),
+        )
+    return communities
+
+
+def process_pool(workers):
+    """Worker processes for building communities side by side, at most one per core."""
+    return ProcessPoolExecutor(max_workers=max(1, min(workers, os.cpu_count() or 1)),
+                               mp_context=multiprocessing.get_context("spawn"))
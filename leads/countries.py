@@ -0,0 +1,128 @@
+"""Offline country table and the ISO codes derived from it.
+
+`countries.csv` (bundled next to this module, generated from ISO 3166-1) has
+one row per country with its ISO 3166-1 numeric, alpha-2 and alpha-3 codes,
+the display name the dashboard uses, a short chart label, its continent,
+EU membership and the other spellings exports and configuration use for it
+("United States of America", "USA", "Korea, Republic of", "Holland", ...).
+Kosovo, which has no ISO 3166-1 entry, is listed with the codes XK/XKX and
+900 from the user-assigned range, as geo-IP databases report it.
+
+Country columns are looked up once per distinct value and mapped to
+integer ISO 3166-1 numeric codes, so groupbys, region filters and charts
+compare small integers instead of strings, and a country is counted once
+whatever it was called. 0 stands for an unknown or unmatched country.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TABLE_PATH = Path(__file__).with_name("countries.csv")
+
+UNKNOWN = 0
+# ISO 3166-1 numeric codes run from 004 to 894, user-assigned ones up to 999
+MAX_CODE = 1000
+
+
+def lookup_key(name):
+    """Case- and whitespace-insensitive form of a country name or code."""
+    return " ".join(str(name).split()).casefold()
+
+
+def load_table(path=TABLE_PATH):
+    """The country table indexed by ISO numeric code, with aliases as lists."""
+    table = pd.read_csv(path, keep_default_na=False, dtype={'iso_numeric': np.int16, 'eu': bool})
+    table['short_name'] = table['short_name'].where(table['short_name'] != '', table['name'])
+    table['aliases'] = table['aliases'].str.split('|').map(lambda aliases: [a for a in aliases if a])
+    return table.set_index('iso_numeric')
+
+
+TABLE = load_table()
+
+# Every name, alias and alpha code -> numeric code
+CODES_BY_KEY = {
+    lookup_key(key): code
+    for code, row in TABLE.iterrows()
+    for key in [row['name'], row['iso2'], row['iso3'], *row['aliases']]
+}
+
+# Display names as a categorical type; its categories are in table order
+COUNTRY_DTYPE = pd.CategoricalDtype(TABLE['name'].tolist())
+REGIONS = sorted(TABLE['region'].unique())
+
+# Numeric code -> display name, chart label, EU membership
+_NAMES = np.full(MAX_CODE, None, dtype=object)
+_NAMES[TABLE.index] = TABLE['name'].to_numpy()
+_SHORT_NAMES = np.full(MAX_CODE, None, dtype=object)
+_SHORT_NAMES[TABLE.index] = TABLE['short_name'].to_numpy()
+_EU = np.zeros(MAX_CODE, dtype=bool)
+_EU[TABLE.index] = TABLE['eu'].to_numpy()
+# Table position of each code, -1 for none; position 0 of the categorical is the first table row
+_POSITIONS = np.full(MAX_CODE, -1, dtype=np.int16)
+_POSITIONS[TABLE.index] = np.arange(len(TABLE))
+
+
+def iso_codes(values):
+    """ISO numeric code of each value (a name, alias or alpha code), UNKNOWN where none matches.
+
+    Categorical and other repetitive columns are looked up once per
+    distinct value and mapped back by code.
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    matched = np.array([CODES_BY_KEY.get(lookup_key(value), UNKNOWN) for value in uniques] + [UNKNOWN],
+                       dtype=np.int16)
+    return matched[codes]
+
+
+def categorical(codes, index=None, name=None):
+    """ISO numeric codes as display names in `COUNTRY_DTYPE`, missing for UNKNOWN."""
+    return pd.Series(pd.Categorical.from_codes(_POSITIONS[codes], dtype=COUNTRY_DTYPE), index=index, name=name)
+
+
+def covered(codes):
+    """Boolean lookup by ISO numeric code, true for `codes`; index it with a code column."""
+    lookup = np.zeros(MAX_CODE, dtype=bool)
+    lookup[codes] = True
+    return lookup
+
+
+def names(codes):
+    """Display name of each ISO numeric code, None for UNKNOWN."""
+    return _NAMES[np.asarray(codes, dtype=np.int64)]
+
+
+def short_names(codes):
+    """Chart label of each ISO numeric code ("USA", "UK", otherwise the name)."""
+    return _SHORT_NAMES[np.asarray(codes, dtype=np.int64)]
+
+
+def is_eu(codes):
+    """EU membership of each ISO numeric code; False for UNKNOWN."""
+    return _EU[np.asarray(codes, dtype=np.int64)]
+
+
+def resolve(countries):
+    """ISO numeric codes of configured country names, aliases or alpha codes.
+
+    Raises ValueError naming any that are not in the table.
+    """
+    unknown = [country for country in countries if lookup_key(country) not in CODES_BY_KEY]
+    if unknown:
+        raise ValueError(f"Unknown countries: {', '.join(map(repr, unknown))}")
+    return np.unique(np.array([CODES_BY_KEY[lookup_key(country)] for country in countries], dtype=np.int16))
+
+
+def region_codes(regions):
+    """ISO numeric codes of the countries on the given continents (see REGIONS)."""
+    unknown = set(regions) - set(REGIONS)
+    if unknown:
+        raise ValueError(f"Unknown regions: {', '.join(sorted(unknown))}; expected some of {', '.join(REGIONS)}")
+    return TABLE.index[TABLE['region'].isin(regions)].to_numpy(dtype=np.int16)
+
+
+def eu_codes():
+    return TABLE.index[TABLE['eu']].to_numpy(dtype=np.int16)
@@ -0,0 +1,182 @@
+"""Aggregate cube of registrations and posts read.
+
+The cube groups the user table once per data version by registration day,
+ISO country code, state and UTC hour. The dashboard's time series, country
+and state bars and the EU split are roll-ups of this cube rather than scans
+of the raw rows; country names and EU membership come from the country
+table after rolling up.
+
+Time series read a dense calendar of daily prefix sums instead: a date range
+is two binary searches, a range total is one subtraction, and weeks, months
+and quarters are differences of the prefix sums at period boundaries.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from leads import countries
+
+DIMENSIONS = ['day', 'country', 'state', 'hour']
+
+GRANULARITIES = ["Daily", "Weekly", "Monthly", "Quarterly"]
+
+
+def build_cube(data):
+    """Groups the cleaned user table into cube cells."""
+    created_at = data['created_at']
+    if created_at.dt.tz is not None:
+        created_at = created_at.dt.tz_convert(None)
+
+    cells = pd.DataFrame({
+        'day': created_at.dt.floor('D'),
+        'country': countries.iso_codes(data['country']),
+        'state': data['last_ip_state'],
+        'hour': created_at.dt.hour,
+        'posts_read': data['posts_read'],
+    })
+    facts = cells.groupby(DIMENSIONS, dropna=False, observed=True, sort=False).agg(
+        users=('posts_read', 'size'),
+        posts_read=('posts_read', 'sum'),
+        posts_counted=('posts_read', 'count'),
+    )
+    return Cube(facts.reset_index())
+
+
+def period_starts(days, granularity):
+    """The first day of the week (Monday), month or quarter containing each of `days`."""
+    if granularity == "Weekly":
+        # 1970-01-01 was a Thursday, three days after a Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    months = days.astype('datetime64[M]')
+    if granularity == "Quarterly":
+        months = months - months.astype(np.int64) % 3
+    return months.astype('datetime64[D]')
+
+
+class DailyTotals:
+    """Prefix sums of registrations and posts read over every day from the first registration to the last."""
+
+    def __init__(self, by_day):
+        days = by_day.index.to_numpy().astype('datetime64[D]')
+        first = days[0] if len(days) else np.datetime64(0, 'D')
+        self.days = np.arange(first, days[-1] + 1 if len(days) else first)
+        positions = (days - first).astype(np.int64)
+        # users[i + 1] - users[j] is the registrations from day j to day i
+        self.users = np.zeros(len(self.days) + 1, dtype=np.int64)
+        self.posts_read = np.zeros(len(self.days) + 1, dtype=np.int64)
+        self.users[positions + 1] = by_day['users'].to_numpy(dtype=np.int64)
+        self.posts_read[positions + 1] = by_day['posts_read'].to_numpy(dtype=np.int64, na_value=0)
+        np.cumsum(self.users, out=self.users)
+        np.cumsum(self.posts_read, out=self.posts_read)
+
+    def bounds(self, start, end):
+        """Positions [i, j) of the days between the dates of `start` and `end`, inclusive."""
+        start = np.datetime64(pd.Timestamp(start).tz_localize(None).floor('D'), 'D')
+        end = np.datetime64(pd.Timestamp(end).tz_localize(None).floor('D'), 'D')
+        return np.searchsorted(self.days, start), np.searchsorted(self.days, end, side='right')
+
+    def total(self, start, end):
+        """Registrations between the dates of `start` and `end`."""
+        i, j = self.bounds(start, end)
+        return int(self.users[max(j, i)] - self.users[i])
+
+    def periods(self, start, end, granularity):
+        """Registrations per period within a date range, as (period start days, counts).
+
+        Daily periods are single days. Periods without registrations are
+        left out, and periods cut by the range only count days inside it.
+        """
+        i, j = self.bounds(start, end)
+        days = self.days[i:j]
+        if granularity == "Daily":
+            firsts = np.arange(len(days))
+            labels = days
+        else:
+            labels = period_starts(days, granularity)
+            changed = np.ones(len(days), dtype=bool)
+            changed[1:] = labels[1:] != labels[:-1]
+            firsts = np.flatnonzero(changed)
+            labels = labels[firsts]
+        edges = np.r_[firsts, len(days)] + i
+        counts = self.users[edges[1:]] - self.users[edges[:-1]]
+        keep = counts > 0
+        return labels[keep], counts[keep]
+
+
+class Cube:
+    """Cube cells plus the roll-ups the dashboard reads from them."""
+
+    def __init__(self, facts):
+        self.facts = facts
+
+    def rollup(self, by):
+        """Sums users and posts read over every dimension except `by`."""
+        return self.facts.groupby(by, observed=True)[['users', 'posts_read', 'posts_counted']].sum()
+
+    @cached_property
+    def by_day(self):
+        return self.rollup('day')
+
+    @cached_property
+    def by_country(self):
+        """Roll-up by ISO numeric country code, without users of unknown countries."""
+        by_country = self.rollup('country')
+        return by_country[by_country.index != countries.UNKNOWN]
+
+    @cached_property
+    def daily(self):
+        return DailyTotals(self.by_day)
+
+    @property
+    def total_posts_read(self):
+        return self.facts['posts_read'].sum()
+
+    def users_per_country(self):
+        """Registrations per ISO numeric country code."""
+        return self.by_country['users']
+
+    @staticmethod
+    def named(series):
+        """`series` indexed by country name instead of ISO code."""
+        return series.set_axis(pd.Index(countries.names(series.index), name='country'))
+
+    def country_counts(self):
+        """Registrations per country name, largest first (like `value_counts`)."""
+        return self.named(self.by_country['users'].sort_values(ascending=False).rename('count'))
+
+    def mean_posts_read_by_country(self):
+        by_country = self.by_country
+        return self.named((by_country['posts_read'] / by_country['posts_counted']).sort_values(ascending=False))
+
+    def eu_counts(self):
+        """Registrations in and outside the EU, by the country table's membership."""
+        users = self.by_country['users']
+        eu = pd.Series(countries.is_eu(users.index), index=users.index, name='is_eu')
+        return users.groupby(eu).sum().sort_values(ascending=False).rename('count')
+
+    def state_counts(self, country):
+        """Registrations per state within one country (a name, alias or ISO code), largest first."""
+        facts = self.facts[self.facts['country'].isin(countries.resolve([country]))]
+        return facts.groupby('state', observed=True)['users'].sum().sort_values(ascending=False).rename('count')
+
+    def registrations_between(self, start, end):
+        """Registrations between the dates of `start` and `end`."""
+        return self.daily.total(start, end)
+
+    def registrations(self, start, end, granularity):
+        """Registration counts per day, week, month or quarter within a date range.
+
+        Daily counts are indexed by `datetime.date`, the others by the first
+        day of the period, and only periods with registrations appear.
+        """
+        labels, counts = self.daily.periods(start, end, granularity)
+        if granularity == "Daily":
+            return pd.Series(counts, index=pd.DatetimeIndex(labels.astype('datetime64[ns]')).date)
+        return pd.Series(counts, index=pd.DatetimeIndex(labels.astype('datetime64[ns]')))
+
+    def cumulative_posts_read(self):
+        """Total posts read by users registered up to each registration day."""
+        days = self.by_day.index
+        positions = (days.to_numpy().astype('datetime64[D]') - self.daily.days[:1]).astype(np.int64)
+        return pd.Series(self.daily.posts_read[positions + 1], index=days.date)
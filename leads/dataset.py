@@ -0,0 +1,98 @@
+"""The user table and everything derived from it, shared by all sessions.
+
+One `Dataset` exists per data version in the process (the app keeps it in
+`st.cache_resource`), so memory does not grow with the number of viewers.
+Sessions treat it as read-only: filters are boolean masks or row-position
+arrays over its rows, and only the rows a view shows are taken out of it.
+"""
+import json
+import threading
+
+from leads import cleaning, countries, listing, organizations, regions, scoring, search
+
+# User table column -> name used by the map layer and its tooltip
+MAP_COLUMNS = {
+    'last_ip_latitude': 'latitude',
+    'last_ip_longitude': 'longitude',
+    'country': 'country',
+    'organization': 'organization',
+    'last_ip_city': 'city',
+    'last_ip_state': 'state',
+    'username': 'username',
+    'posts_read': 'posts_read',
+}
+
+
+def build_map_frame(data, country_codes):
+    """Map columns under their layer names, jittered once, with tooltip HTML and ISO country codes."""
+    frame = data[list(MAP_COLUMNS)].rename(columns=MAP_COLUMNS)
+    frame['country_code'] = country_codes
+    # Jitter every row once so each user keeps the same offset whatever the filters
+    frame['latitude'], frame['longitude'] = cleaning.add_jitter(frame['latitude'], frame['longitude'])
+    organization = frame['organization'].astype('string')
+    frame['organization_html'] = ('<b>Organization:</b> ' + organization + '<br/>').fillna('')
+    return frame
+
+
+class Dataset:
+    """One version of the user table plus its lazily built, shared derivatives."""
+
+    def __init__(self, data, version, profile_url=listing.PROFILE_URL):
+        self.data = data
+        self.version = version
+        self.profile_url = profile_url
+        self._built = {}
+        self._lock = threading.RLock()
+
+    def _shared(self, name, build):
+        # Built once per version, by whichever session asks first
+        with self._lock:
+            if name not in self._built:
+                self._built[name] = build()
+            return self._built[name]
+
+    @property
+    def search_index(self):
+        """Trigram indexes for username, country and organization searches."""
+        return self._shared('search_index', lambda: search.build_search_index(self.data))
+
+    @property
+    def listing(self):
+        """Sort keys and page builder for the leads listing."""
+        return self._shared('listing', lambda: listing.LeadsListing(self.data, self.profile_url))
+
+    @property
+    def organizations(self):
+        """Canonical organization clusters of every row."""
+        return self._shared('organizations', lambda: organizations.normalize_organizations(
+            self.data['organization']))
+
+    def organization_rows(self, names):
+        """Rows whose organization cluster matches one of `names`, see `Organizations.matching`."""
+        return self._shared(('organization_rows', tuple(names)), lambda: self.organizations.matching(names))
+
+    @property
+    def scorer(self):
+        """Lead score signals of every row."""
+        return self._shared('scorer', lambda: scoring.LeadScorer(self.data, self.organizations))
+
+    @property
+    def country_codes(self):
+        """ISO numeric country code of every row, 0 when unknown."""
+        return self._shared('country_codes', lambda: countries.iso_codes(self.data['country']))
+
+    @property
+    def map_frame(self):
+        return self._shared('map_frame', lambda: build_map_frame(self.data, self.country_codes))
+
+    @property
+    def has_coordinates(self):
+        """Rows with both a latitude and a longitude."""
+        return self._shared('has_coordinates', lambda: (
+            self.data['last_ip_latitude'].notna() & self.data['last_ip_longitude'].notna()).to_numpy())
+
+    def regions(self, definitions=regions.DEFAULT_REGIONS):
+        """Row partitions of the map's regions, built once per set of definitions."""
+        key = json.dumps(definitions, sort_keys=True)
+        return self._shared(('regions', key), lambda: regions.RegionPartitions(
+            self.country_codes, self.has_coordinates, definitions))
@@ -0,0 +1,200 @@
+"""Incremental user sync from the Discourse admin API.
+
+An alternative to the Google Sheets exports: users are read straight from
+`/admin/users/list/<list>.json`, oldest first, 100 per page. Pages are fetched
+a few at a time over one pooled keep-alive session, and failed requests are
+retried with exponential backoff. A sync resumes from the snapshot store's
+watermark, so a refresh only transfers the pages holding new users.
+
+The admin list has the account fields (id, username, name, created_at,
+posts_read_count). Keys named like the sheet export columns, for example
+from a serializer plugin, are kept as they are; columns the API does not
+provide stay empty.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from leads import cleaning, schema
+
+logger = logging.getLogger(__name__)
+
+# Fixed by Discourse (AdminUserIndexQuery::PAGE_SIZE)
+PAGE_SIZE = 100
+USER_LIST_PATH = "/admin/users/list/{user_list}.json"
+
+# Admin API key -> sheet export column
+FIELDS = {
+    'id': 'user_id',
+    'username': 'username',
+    'name': 'name',
+    'created_at': 'created_at',
+    'posts_read_count': 'posts_read',
+}
+EXPORT_COLUMNS = ['user_id', 'username', 'name', 'organization', 'created_at', 'posts_read',
+                  'last_ip_country', 'last_ip_state', 'last_ip_city', 'last_ip_latitude',
+                  'last_ip_longitude', 'last_ip_is_eu_member']
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_WORKERS = 4
+DEFAULT_ATTEMPTS = 5
+
+
+def is_retryable(exc):
+    """Connection problems, timeouts, rate limiting and server errors are worth another try."""
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and exc.response.status_code in RETRY_STATUSES
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def retry_after(retry_state, backoff):
+    """Waits as long as a 429's Retry-After header asks, otherwise as `backoff` says."""
+    wait = backoff(retry_state)
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    response = getattr(exc, 'response', None)
+    if response is not None and response.headers.get('Retry-After', '').isdigit():
+        wait = max(wait, int(response.headers['Retry-After']))
+    return wait
+
+
+class DiscourseClient:
+    """Admin API client with a pooled session shared by its worker threads."""
+
+    def __init__(self, base_url, api_key, api_username, user_list="active", workers=DEFAULT_WORKERS,
+                 timeout=30, attempts=DEFAULT_ATTEMPTS, max_wait=30):
+        self.base_url = base_url.rstrip("/")
+        self.user_list = user_list
+        self.workers = workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        # One keep-alive connection per worker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Api-Key": api_key, "Api-Username": api_username})
+        backoff = wait_exponential_jitter(initial=0.5, max=max_wait)
+        self._retrying = Retrying(
+            retry=retry_if_exception(is_retryable),
+            wait=lambda retry_state: retry_after(retry_state, backoff),
+            stop=stop_after_attempt(attempts),
+            reraise=True,
+        )
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get(self, path, params):
+        response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def users_page(self, page):
+        """Users on the 1-based `page` of the list, oldest registration first."""
+        path = USER_LIST_PATH.format(user_list=self.user_list)
+        params = {"order": "created", "asc": "true", "page": page}
+        return self._retrying(self._get, path, params)
+
+    def start_page(self, watermark):
+        """The first page to fetch from and its records, or (1, None) to fetch from the start.
+
+        The list is ordered by registration, so users already synced fill
+        about the first `watermark['rows']` places, and the page holding the
+        last of them is tried first. When older accounts were deleted or
+        deactivated since the last sync, the list is shorter and that page
+        may already start after the watermark; fetching then steps back,
+        twice as far each time, until a page starts at or before it.
+        """
+        page = max(1, watermark['rows'] // PAGE_SIZE)
+        last_synced = pd.Timestamp(watermark['created_at'])
+        step = 1
+        while page > 1:
+            records = self.users_page(page)
+            if records and pd.Timestamp(records[0]['created_at']) <= last_synced:
+                return page, records
+            logger.info("Page %d of %s starts after the last synced user; stepping back", page, self.base_url)
+            page = max(1, page - step)
+            step *= 2
+        return 1, None
+
+    def users_since(self, watermark=None):
+        """Raw user records newer than `watermark`, fetching `workers` pages at a time.
+
+        Fetching starts at `start_page`, so users registered since the last
+        sync are never skipped, even when the list has shrunk.
+        """
+        page, records = self.start_page(watermark) if watermark else (1, None)
+        first_page = page
+        users = list(records or [])
+        more = records is None or len(records) == PAGE_SIZE
+        if records is not None:
+            page += 1
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while more:
+                pages = list(pool.map(self.users_page, range(page, page + self.workers)))
+                for records in pages:
+                    users.extend(records)
+                more = all(len(records) == PAGE_SIZE for records in pages)
+                page += self.workers
+        logger.info("Fetched %d users from %s starting at page %d", len(users), self.base_url, first_page)
+        return newer_than(users_frame(users), watermark)
+
+
+def client_from_config(config):
+    """A client for the `[discourse]` settings: base_url, api_key, api_username, and optionally user_list and workers."""
+    return DiscourseClient(
+        config["base_url"],
+        config["api_key"],
+        config["api_username"],
+        user_list=config.get("user_list", "active"),
+        workers=config.get("workers", DEFAULT_WORKERS),
+    )
+
+
+def users_frame(records):
+    """Admin API user records as a raw table with the sheet export columns."""
+    frame = pd.DataFrame.from_records(records).rename(columns=FIELDS)
+    return frame.reindex(columns=EXPORT_COLUMNS).drop_duplicates('user_id', keep='last')
+
+
+def newer_than(raw, watermark):
+    """Rows with a larger user id or a later registration than the watermark, as `SnapshotStore.append` keeps."""
+    if watermark is None or raw.empty:
+        return raw
+    created_at = pd.to_datetime(raw['created_at'], utc=True)
+    return raw[(raw['user_id'] > watermark['user_id'])
+               | (created_at > pd.Timestamp(watermark['created_at']))]
+
+
+def sync_users(client, store, timing_log=None, junk=cleaning.JUNK_ORGANIZATIONS):
+    """Appends the users registered since the store's watermark and returns `(data, version)`.
+
+    The new users are cleaned on their own and appended to the snapshot with
+    the stored rows, re-typed together so categories stay shared.
+    """
+    section = timing_log.section if timing_log is not None else lambda name: nullcontext()
+    watermark = store.watermark() if store.exists() else None
+    with section("ingest: fetch discourse"):
+        raw = client.users_since(watermark)
+    if raw.empty:
+        if watermark is None:
+            return cleaning.clean_users(raw, junk), "empty"
+        return store.load_or_raise()
+    with section("ingest: clean"):
+        new_users = cleaning.clean_users(raw, junk)
+    with section("ingest: snapshot"):
+        if watermark is None:
+            store.write(new_users)
+        else:
+            store.append(schema.apply_schema(pd.concat([store.read(), new_users], ignore_index=True)))
+        return store.load_or_raise()
@@ -0,0 +1,148 @@
+"""Chunked export of the filtered leads listing to CSV, Parquet or XLSX.
+
+Rows are taken from the shared dataset `CHUNK_SIZE` at a time, in the
+listing's order, and written straight to the output file, so only one chunk
+of the table is ever materialized next to the dataset. XLSX needs the
+optional XlsxWriter package (`pip install XlsxWriter`); without it the
+format is not offered.
+
+`st.download_button` holds the whole file in memory for as long as the
+session keeps the button, whatever it is handed, so `download_bytes` only
+reads back exports up to `MAX_DOWNLOAD_BYTES`.
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from leads.listing import RANKED
+
+CHUNK_SIZE = 50_000
+
+# Header row included
+XLSX_MAX_ROWS = 1_048_576
+# Largest export offered for download
+MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+
+
+def chunks(leads, rows, columns=None, scores=None, chunk_size=CHUNK_SIZE):
+    """Yields the listing frame of `rows` chunk by chunk; with `scores`, as a leading score column.
+
+    An empty `rows` still yields one empty frame, so the output gets its header.
+    """
+    for start in range(0, max(len(rows), 1), chunk_size):
+        frame = leads.frame(rows[start:start + chunk_size], columns)
+        if scores is not None:
+            frame.insert(0, RANKED, scores[start:start + chunk_size])
+        yield frame
+
+
+def write_tables(frames, open_writer):
+    """Converts frames to Arrow tables with the first frame's schema and writes them.
+
+    `open_writer(schema)` returns the writer and the schema it takes, which
+    may differ from the frames' schema; it is called once, on the first frame.
+    """
+    writer = schema = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False, schema=frame_schema if writer else None)
+            if writer is None:
+                frame_schema = table.schema
+                writer, schema = open_writer(frame_schema)
+            writer.write_table(table.cast(schema, safe=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def csv_schema(schema):
+    """The schema with timestamps in whole seconds, which Arrow's CSV writer prints without a fraction."""
+    return pa.schema([
+        field.with_type(pa.timestamp('s', field.type.tz)) if pa.types.is_timestamp(field.type) else field
+        for field in schema
+    ])
+
+
+def write_csv(frames, file):
+    """Writes frames to a binary file as one UTF-8 CSV with a single header."""
+    def open_writer(schema):
+        schema = csv_schema(schema)
+        return pacsv.CSVWriter(file, schema), schema
+    write_tables(frames, open_writer)
+
+
+def write_parquet(frames, file):
+    """Writes frames to a binary file as one Parquet row group per frame."""
+    write_tables(frames, lambda schema: (pq.ParquetWriter(file, schema), schema))
+
+
+def excel_values(frame):
+    """Cell values of a frame row by row: naive datetimes, None for missing values."""
+    frame = frame.copy()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.DatetimeTZDtype):
+            frame[column] = frame[column].dt.tz_localize(None)
+    values = frame.astype(object)
+    return values.where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+def write_xlsx(frames, file):
+    """Writes frames to a binary file as one XLSX sheet, row by row in constant memory."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file, {'constant_memory': True, 'in_memory': False, 'strings_to_urls': False})
+    sheet = workbook.add_worksheet('Leads')
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    row_number = 0
+    try:
+        for frame in frames:
+            if row_number == 0:
+                sheet.write_row(0, 0, list(frame.columns))
+                dates = [i for i, column in enumerate(frame.columns)
+                         if pd.api.types.is_datetime64_any_dtype(frame[column])]
+                for i in dates:
+                    sheet.set_column(i, i, 19, date_format)
+                row_number = 1
+            if row_number + len(frame) > XLSX_MAX_ROWS:
+                raise ValueError(f"XLSX sheets hold at most {XLSX_MAX_ROWS - 1:,} rows; export CSV or Parquet")
+            for values in excel_values(frame):
+                sheet.write_row(row_number, 0, values)
+                row_number += 1
+    finally:
+        workbook.close()
+
+
+FORMATS = {
+    'CSV': {'write': write_csv, 'extension': 'csv', 'mime': 'text/csv'},
+    'Parquet': {'write': write_parquet, 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+    'XLSX': {'write': write_xlsx, 'extension': 'xlsx',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+}
+
+
+def available_formats():
+    """Names of the formats that can be written here; XLSX only with XlsxWriter installed."""
+    return [name for name in FORMATS
+            if name != 'XLSX' or importlib.util.find_spec('xlsxwriter') is not None]
+
+
+def export(leads, rows, file, format='CSV', columns=None, scores=None, chunk_size=CHUNK_SIZE):
+    """Writes `rows` of the listing to the binary `file` in `format`, one chunk at a time."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}; expected one of {', '.join(FORMATS)}")
+    FORMATS[format]['write'](chunks(leads, np.asarray(rows), columns, scores, chunk_size), file)
+
+
+def download_bytes(file, limit=MAX_DOWNLOAD_BYTES):
+    """The contents of the written export `file`; raises ValueError when it is larger than `limit`."""
+    size = file.seek(0, os.SEEK_END)
+    if size > limit:
+        raise ValueError(f"This export is {size / 2 ** 20:,.0f} MB, over the {limit / 2 ** 20:,.0f} MB download "
+                         f"limit; choose fewer columns, narrow the filters or export Parquet")
+    file.seek(0)
+    return file.read()
@@ -0,0 +1,170 @@
+"""Loading the Discourse user exports that feed the dashboard.
+
+The exports live in Google Sheets and are downloaded as CSV. All sheets are
+fetched in parallel, and `RefreshingCache` keeps one process-wide copy that is
+refreshed in a background thread once it is older than its TTL, so a
+Streamlit rerun never waits on Google Drive after the first load.
+"""
+import hashlib
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+import requests
+
+from leads import cleaning, schema
+
+logger = logging.getLogger(__name__)
+
+SHEET_EXPORT_URL = "https://docs.google.com/spreadsheets/d/{file_id}/export?format=csv"
+DEFAULT_TTL_SECONDS = 600
+
+
+def sheet_export_url(file_id, template=SHEET_EXPORT_URL):
+    """Returns the CSV export URL for a Google Sheets file id."""
+    return template.format(file_id=file_id)
+
+
+def sheet_urls(config):
+    """Export URLs for the `gdrive_file_id_<n>` entries of the `[data]` settings."""
+    template = config.get("export_url_template", SHEET_EXPORT_URL)
+    keys = sorted(
+        (key for key in config if key.startswith("gdrive_file_id_")),
+        key=lambda key: int(key.rsplit("_", 1)[1])
+    )
+    return tuple(sheet_export_url(config[key], template) for key in keys)
+
+
+def fetch_csv(session, url, timeout=30):
+    """Downloads one CSV export and returns the raw bytes."""
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def load_sheets(urls, timeout=30):
+    """Downloads all exports in parallel and concatenates them.
+
+    Returns `(data, version)` where `version` is a digest of the downloaded
+    bytes, so an unchanged export keeps the same version across refreshes.
+    """
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        contents = list(pool.map(lambda url: fetch_csv(session, url, timeout), urls))
+
+    digest = hashlib.sha1()
+    for content in contents:
+        digest.update(content)
+
+    frames = [pd.read_csv(io.BytesIO(content)) for content in contents]
+    return pd.concat(frames), digest.hexdigest()[:12]
+
+
+def load_users(urls, store=None, timeout=30, timing_log=None, junk=cleaning.JUNK_ORGANIZATIONS):
+    """Downloads and cleans the user table, replacing the snapshot in `store` when it changed.
+
+    The exports always hold every user, so the version is a digest of their
+    content and of the cleaning settings. Without a snapshot store this
+    returns the freshly cleaned table. With one, the snapshot is rewritten
+    when that digest differs from the stored one, so edited users (posts
+    read, organization, location) are updated as well as new ones added, and
+    the snapshot itself is returned. Each step is recorded as an
+    "ingest: ..." section when a `TimingLog` is given. `junk` lists the
+    placeholder organization names cleaning drops.
+    """
+    section = timing_log.section if timing_log is not None else lambda name: nullcontext()
+    with section("ingest: fetch sheets"):
+        raw, version = load_sheets(urls, timeout)
+    version = hashlib.sha1("|".join([version, *junk]).encode()).hexdigest()[:12]
+    with section("ingest: clean"):
+        data = cleaning.clean_users(raw, junk)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("User table memory (bytes):\n%s", schema.memory_report(raw, data))
+    if store is None:
+        return data, version
+    with section("ingest: snapshot"):
+        store.replace(data, version)
+        return store.load_or_raise()
+
+
+class RefreshingCache:
+    """Process-wide cached value with stale-while-revalidate refreshes.
+
+    `load` is called with no arguments and returns `(value, version)`. The
+    first `get()` blocks until a value is loaded; after that, `get()` always
+    returns immediately and starts a background refresh when the cached value
+    is older than `ttl` seconds. A failed refresh keeps serving the old value.
+
+    `initial`, if given, is tried before the first `load` and may return
+    `(value, version)` or None. A value it returns is served straight away
+    and treated as stale, so a background refresh follows immediately.
+    """
+
+    def __init__(self, load, ttl=DEFAULT_TTL_SECONDS, initial=None):
+        self._load = load
+        self._initial = initial
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+        self._value = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    @property
+    def version(self):
+        return self._version
+
+    def is_stale(self):
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def get(self):
+        """Returns `(value, version)`, loading synchronously only the first time."""
+        if self._value is None:
+            with self._first_load:
+                if self._value is None:
+                    self._first()
+        if self.is_stale():
+            self.refresh_in_background()
+        with self._lock:
+            return self._value, self._version
+
+    def _first(self):
+        loaded = self._initial() if self._initial is not None else None
+        if loaded is None:
+            self._store(*self._load())
+        else:
+            self._store(*loaded)
+            self._loaded_at = float("-inf")
+
+    def refresh_in_background(self):
+        """Starts a refresh thread unless one is already running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="leads-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            value, version = self._load()
+        except Exception as exc:
+            # Keep serving the stale copy and try again after another TTL.
+            logger.warning("Background refresh failed: %s", exc)
+            with self._lock:
+                self._loaded_at = time.monotonic()
+        else:
+            self._store(value, version)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _store(self, value, version):
+        with self._lock:
+            if version != self._version:
+                self._value = value
+                self._version = version
+            self._loaded_at = time.monotonic()
@@ -0,0 +1,199 @@
+"""Wall time, CPU time and peak memory for named sections of the app.
+
+Every finished section produces one record. The record goes to the
+session's table of latest timings, to a process-wide rolling window used for
+percentiles, and to the `leads.instrument` logger as one JSON object per line:
+
+    {"section": "map", "wall_s": 0.071, "cpu_s": 0.064, "peak_mem_delta_bytes": 1835008, ...}
+
+Aggregate a captured log with `python -m leads.instrument app.log`.
+"""
+import argparse
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Records kept per section for the in-process percentiles
+SAMPLES_PER_SECTION = 1000
+
+PERCENTILES = (0.5, 0.95)
+METRICS = ('wall_s', 'cpu_s', 'peak_mem_delta_bytes')
+
+
+def peak_rss():
+    """The process's peak resident set size in bytes, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def enable_json_log(stream=None):
+    """Writes the timing records to `stream` (stderr by default), one JSON object per line."""
+    if any(getattr(handler, '_json_timings', False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler._json_timings = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class TimingLog:
+    """Collects section timings from every session in the process.
+
+    By default the memory figure is how far a section raised the process's
+    peak RSS. That costs nothing, but it stays at zero while the process is
+    below an earlier high-water mark. With `trace_memory` the figure is the
+    section's own peak allocation from tracemalloc instead. That covers NumPy
+    and pandas buffers but not Arrow's allocator, and it roughly doubles the
+    cost of allocation-heavy code. Both measures are process-wide, so
+    sessions running at the same time can inflate each other's numbers.
+    """
+
+    def __init__(self, samples=SAMPLES_PER_SECTION, trace_memory=False):
+        self.trace_memory = trace_memory
+        self._samples = defaultdict(lambda: deque(maxlen=samples))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _open_sections(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def section(self, name, latest=None, session=None):
+        """Times the enclosed block as section `name`.
+
+        Sections nest: an outer section's peak includes its inner ones. The
+        finished record is also stored in `latest[name]` when a dict is given.
+        """
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        stack = self._open_sections()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame = {'start': current, 'peak': current}
+        else:
+            frame = {'rss': peak_rss()}
+        stack.append(frame)
+
+        error = None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            stack.pop()
+            if tracing:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                peak_delta = peak - frame['start']
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            else:
+                rss = peak_rss()
+                peak_delta = None if rss is None else rss - frame['rss']
+            self.record({
+                'section': name,
+                'wall_s': round(wall, 6),
+                'cpu_s': round(cpu, 6),
+                'peak_mem_delta_bytes': peak_delta,
+                'session': session,
+                'error': error,
+                'at': round(time.time(), 3),
+            }, latest)
+
+    def timed(self, name, context=dict):
+        """Decorator form of `section`; `context()` supplies its keyword arguments per call."""
+        def decorate(func):
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                with self.section(name, **context()):
+                    return func(*args, **kwargs)
+            return run
+        return decorate
+
+    def record(self, record, latest=None):
+        with self._lock:
+            self._samples[record['section']].append(record)
+        if latest is not None:
+            latest[record['section']] = record
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record))
+
+    def records(self):
+        with self._lock:
+            return [record for samples in self._samples.values() for record in samples]
+
+    def summary(self):
+        return summarize(self.records())
+
+
+def records_frame(records):
+    """The records as a table, in the order they were given."""
+    return pd.DataFrame(list(records), columns=['section', *METRICS, 'error'])
+
+
+def summarize(records):
+    """Count, p50 and p95 of wall time, CPU time and peak memory per section."""
+    frame = records_frame(records)
+    if frame.empty:
+        return pd.DataFrame()
+    frame[list(METRICS)] = frame[list(METRICS)].astype(float)
+    grouped = frame.groupby('section', sort=False)[list(METRICS)].quantile(list(PERCENTILES)).unstack()
+    grouped.columns = [f"{metric} p{int(q * 100)}" for metric, q in grouped.columns]
+    grouped.insert(0, 'count', frame.groupby('section', sort=False).size())
+    return grouped.sort_values(f"wall_s p{int(PERCENTILES[-1] * 100)}", ascending=False)
+
+
+def read_log(lines):
+    """Yields the timing records found in log lines, skipping everything else."""
+    for line in lines:
+        start = line.find('{"section"')
+        if start < 0:
+            continue
+        try:
+            yield json.loads(line[start:])
+        except ValueError:
+            continue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize section timings from app logs.")
+    parser.add_argument("logs", nargs="+")
+    args = parser.parse_args()
+
+    records = []
+    for path in args.logs:
+        with open(path) as f:
+            records.extend(read_log(f))
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summarize(records))
+
+
+if __name__ == "__main__":
+    main()
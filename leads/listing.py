@@ -0,0 +1,95 @@
+"""Backend for the paged B2B leads listing.
+
+Filters produce arrays of row positions into the shared dataset, sorting
+reorders those positions using precomputed per-column ranks, and only the
+rows and columns of the visible page are ever materialized.
+"""
+import numpy as np
+import pandas as pd
+
+PROFILE_URL = "https://community.theta360.guide/u/{username}/summary"
+
+# Shown first, in this order
+LEADING_COLUMNS = ['organization', 'country', 'last_ip_state', 'name', 'profile_link']
+# Never shown in the listing
+HIDDEN_COLUMNS = ['user_id', 'Username', 'last_ip_latitude', 'last_ip_longitude',
+                  'registration_ip_longitude', 'hour', 'day_of_week',
+                  'registration_ip_latitude']
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# "Sort by" option that ranks leads by score instead of by a column
+RANKED = 'lead_score'
+
+# Organizations hidden by the "Exclude Ricoh and Oppkey" toggle, matched by canonical key
+EXCLUDED_ORGANIZATIONS = ('Ricoh', 'Oppkey')
+
+
+def profile_links(usernames, template=PROFILE_URL):
+    """Profile URLs for a Series of usernames, '' where the username is missing."""
+    prefix, suffix = template.split("{username}")
+    links = prefix + usernames.astype(str) + suffix
+    return links.where(usernames.notna(), '')
+
+
+class LeadsListing:
+    """Sorts and pages row positions of one read-only dataset."""
+
+    def __init__(self, data, profile_url=PROFILE_URL):
+        self.data = data
+        self.profile_url = profile_url
+        remaining = [c for c in data.columns if c not in LEADING_COLUMNS and c not in HIDDEN_COLUMNS]
+        self.columns = [c for c in LEADING_COLUMNS if c in data.columns or c == 'profile_link'] + remaining
+        self._ranks = {}
+
+    def rank(self, column):
+        """Dense sort key for `column`, with missing values as +inf. Cached per column."""
+        if column not in self._ranks:
+            values = self.data[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Order by category label whatever order the categories are in
+                label_ranks = pd.Series(values.cat.categories).rank(method='dense').to_numpy()
+                codes = values.cat.codes.to_numpy()
+                values = pd.Series(np.where(codes >= 0, label_ranks[codes], np.nan))
+            ranks = values.rank(method='first').to_numpy(dtype=float, na_value=np.nan)
+            self._ranks[column] = np.where(np.isnan(ranks), np.inf, ranks)
+        return self._ranks[column]
+
+    def sort(self, rows, column, ascending=True):
+        """Returns `rows` ordered by `column`; missing values always sort last.
+
+        Profile links sort by username; any other unknown column (or None)
+        keeps the dataset order.
+        """
+        if column == 'profile_link':
+            column = 'username'
+        if column not in self.data.columns:
+            return rows
+        keys = self.rank(column)[rows]
+        if not ascending:
+            keys = np.where(np.isinf(keys), np.inf, -keys)
+        return rows[np.argsort(keys, kind='stable')]
+
+    @staticmethod
+    def page_count(rows, page_size):
+        return max(1, -(-len(rows) // page_size))
+
+    def frame(self, rows, columns=None):
+        """DataFrame with the given display `columns` (all by default) of `rows`, in that order."""
+        columns = self.columns if columns is None else [c for c in columns if c in self.columns]
+        source = [c for c in columns if c != 'profile_link']
+        if 'profile_link' in columns and 'username' not in source and 'username' in self.data:
+            source.append('username')
+        frame = self.data.iloc[rows, [self.data.columns.get_loc(c) for c in source]]
+        if 'profile_link' in columns:
+            frame.insert(
+                columns.index('profile_link'),
+                'profile_link',
+                profile_links(frame['username'], self.profile_url) if 'username' in frame else ''
+            )
+        return frame[columns]
+
+    def page(self, rows, number, page_size):
+        """DataFrame with the display columns for page `number` (1-based) of `rows`."""
+        start = (number - 1) * page_size
+        return self.frame(rows[start:start + page_size])
@@ -0,0 +1,143 @@
+"""The scatter map's payload, sized by what the chosen view can show.
+
+`st.pydeck_chart` sends the layer data to the browser as JSON records, so
+every row and column of the layer frame is paid for on every render. The
+map therefore gets:
+
+- every selected user while there are at most `MAX_POINTS` of them, so the
+  map can be panned anywhere; above that, only the rows inside the chosen
+  viewport, with a margin for panning,
+- only the columns its tooltip reads, with coordinates rounded to ~10 m,
+- one point per grid cell instead of one per user whenever more than
+  `MAX_POINTS` users are in view. Cells shrink as the zoom grows, so zooming
+  in on a region ends with individual users again, and a culled viewport
+  holds at most about 3,000 cells whatever the number of users.
+
+The browser does not report its zoom or viewport back to Streamlit, so the
+view is chosen with zoom and center controls next to the map and culling
+uses those.
+"""
+import numpy as np
+import pandas as pd
+
+from leads import countries
+
+# Zoom control label -> deck.gl zoom level
+ZOOM_LEVELS = {"World": 1, "Continent": 3, "Country": 5, "Region": 7, "City": 9}
+WORLD_CENTER = (20.0, 0.0)
+
+# Individual users shown at most; above this the view is culled and the users in it clustered
+MAX_POINTS = 20_000
+# Grid cells across a 256 px tile; cells are 360 / 2**zoom / CELLS_PER_TILE degrees wide
+CELLS_PER_TILE = 8
+# Viewport assumed for culling, in pixels, and the extra width kept on each side for panning
+VIEW_WIDTH, VIEW_HEIGHT = 1200, 600
+CULL_MARGIN = 0.5
+COORDINATE_DECIMALS = 4
+
+POINT_COLUMNS = ['longitude', 'latitude', 'username', 'organization_html', 'city', 'state', 'country', 'posts_read']
+
+
+def cell_degrees(zoom):
+    return 360 / 2 ** zoom / CELLS_PER_TILE
+
+
+def grid_cells(latitude, longitude, size):
+    """Grid cell number of each coordinate for cells `size` degrees wide."""
+    columns = int(np.ceil(360 / size))
+    return (np.floor((latitude + 90) / size) * columns + np.floor((longitude + 180) / size)).astype(np.int64)
+
+
+def top_countries(map_frame, rows, n=30):
+    """The `n` countries with the most of `rows`' users, largest first, as (code, name) pairs."""
+    users = np.bincount(map_frame['country_code'].to_numpy()[rows], minlength=countries.MAX_CODE)
+    users[countries.UNKNOWN] = 0
+    order = np.argsort(-users, kind='stable')[:n]
+    order = order[users[order] > 0]
+    return list(zip(order.tolist(), countries.names(order)))
+
+
+def view_center(map_frame, rows, zoom, country=None):
+    """Latitude and longitude to center the view on.
+
+    The median position of the `rows`, or of those in the `country` code
+    when one is given; without one the world view keeps its fixed center.
+    """
+    if country is not None:
+        rows = rows[map_frame['country_code'].to_numpy()[rows] == country]
+    elif zoom <= ZOOM_LEVELS["World"]:
+        return WORLD_CENTER
+    if not len(rows):
+        return WORLD_CENTER
+    latitude = map_frame['latitude'].to_numpy(dtype=np.float64)[rows]
+    longitude = map_frame['longitude'].to_numpy(dtype=np.float64)[rows]
+    return float(np.median(latitude)), float(np.median(longitude))
+
+
+def in_view(map_frame, rows, center, zoom):
+    """The `rows` inside the viewport at `center` and `zoom`, widened by CULL_MARGIN on each side."""
+    degrees_per_pixel = 360 / 256 / 2 ** zoom
+    half_width = VIEW_WIDTH / 2 * degrees_per_pixel * (1 + 2 * CULL_MARGIN)
+    half_height = VIEW_HEIGHT / 2 * degrees_per_pixel * (1 + 2 * CULL_MARGIN)
+    if half_width >= 180:
+        return rows
+    latitude = map_frame['latitude'].to_numpy()[rows]
+    # Longitudes wrap around the antimeridian
+    longitude_offset = (map_frame['longitude'].to_numpy()[rows] - center[1] + 180) % 360 - 180
+    keep = (np.abs(latitude - center[0]) <= half_height) & (np.abs(longitude_offset) <= half_width)
+    return rows[keep]
+
+
+def points(map_frame, rows):
+    """One record per user with the tooltip columns and rounded coordinates."""
+    frame = map_frame.iloc[rows, [map_frame.columns.get_loc(c) for c in POINT_COLUMNS]]
+    return frame.assign(**{
+        column: frame[column].astype(np.float64).round(COORDINATE_DECIMALS) for column in ['longitude', 'latitude']
+    })
+
+
+def clusters(map_frame, rows, zoom):
+    """One record per occupied grid cell: users, their mean position, posts read and most common country.
+
+    `radius` is in meters and grows with the square root of the cell's users,
+    so the busiest cell fills its cell and a cell of one user is a dot.
+    """
+    size = cell_degrees(zoom)
+    latitude = map_frame['latitude'].to_numpy(dtype=np.float64)[rows]
+    longitude = map_frame['longitude'].to_numpy(dtype=np.float64)[rows]
+    cells, cell, users = np.unique(grid_cells(latitude, longitude, size), return_inverse=True, return_counts=True)
+
+    posts = map_frame['posts_read'].to_numpy(dtype=np.float64, na_value=0)[rows]
+    codes = map_frame['country_code'].to_numpy()[rows]
+    top_country = np.full(len(cells), '', dtype=object)
+    known = codes != countries.UNKNOWN
+    if known.any():
+        # Most common country per cell: count (cell, country) pairs, keep each cell's largest
+        pairs, pair_users = np.unique(cell[known] * countries.MAX_CODE + codes[known], return_counts=True)
+        pair_cell = pairs // countries.MAX_CODE
+        order = np.lexsort((-pair_users, pair_cell))
+        first = order[np.r_[True, pair_cell[order][1:] != pair_cell[order][:-1]]]
+        top_country[pair_cell[first]] = countries.names(pairs[first] % countries.MAX_CODE)
+
+    scale = np.sqrt(users / users.max()) if len(users) else users
+    return pd.DataFrame({
+        'longitude': (np.bincount(cell, longitude) / users).round(COORDINATE_DECIMALS),
+        'latitude': (np.bincount(cell, latitude) / users).round(COORDINATE_DECIMALS),
+        'users': users,
+        'posts_read': np.bincount(cell, posts).astype(np.int64),
+        'country': top_country,
+        'radius': np.maximum(scale * size * 111_000 / 2, 2_000).round(),
+    })
+
+
+def map_payload(map_frame, rows, zoom, country=None):
+    """The layer data for `rows` at `zoom`, as (frame, clustered, users in view, view center).
+
+    The view centers on the `country` code's users when one is given (see
+    `view_center`); rows outside it are only dropped above MAX_POINTS.
+    """
+    center = view_center(map_frame, rows, zoom, country)
+    visible = rows if len(rows) <= MAX_POINTS else in_view(map_frame, rows, center, zoom)
+    if len(visible) <= MAX_POINTS:
+        return points(map_frame, visible), False, len(visible), center
+    return clusters(map_frame, visible, zoom), True, len(visible), center
@@ -0,0 +1,231 @@
+"""Canonical organization keys and clusters of near-duplicate names.
+
+People type their company in many ways ("RICOH Company, Ltd.", "Ricoh",
+"ricoh co."), so counting raw values overstates the number of
+organizations. Normalization runs once per data version:
+
+1. Each distinct name gets a canonical key: Unicode-normalized, case-folded,
+   punctuation removed and trailing legal suffixes stripped. Placeholders
+   such as "none" or "x" get no key.
+2. Keys that still differ by a typo or a space are clustered. Candidate
+   pairs come from MinHash signatures over character trigrams, banded into
+   LSH buckets, so only keys sharing a bucket are compared rather than all
+   pairs. A candidate is merged when its edit similarity is high enough.
+3. Each cluster is named after its most common spelling.
+"""
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from leads.cleaning import JUNK_ORGANIZATIONS
+from leads.search import encode, gram_codes
+
+LEGAL_SUFFIXES = [
+    'inc', 'incorporated', 'llc', 'llp', 'lp', 'ltd', 'limited', 'co', 'corp', 'corporation',
+    'company', 'gmbh', 'ag', 'kg', 'kk', 'sa', 'sas', 'sarl', 'srl', 'spa', 'bv', 'nv', 'plc',
+    'pty', 'pvt', 'private', 'oy', 'ab', 'as',
+]
+# "& Co. KG" ends in "and co kg" once '&' is spelled out, so a trailing "and" goes too
+TRAILING_SUFFIXES = re.compile(r'(?:\s+(?:and|' + '|'.join(LEGAL_SUFFIXES) + r'))+$')
+
+# Keys that mean "no organization", on top of the cleaning placeholders
+JUNK_KEYS = {'', 'n a', 'na', 'null', 'self', 'me', 'personal', 'individual'} | {
+    ' '.join(name.casefold().split()) for name in JUNK_ORGANIZATIONS}
+
+# MinHash/LSH parameters: 15 bands of 2 hashes make pairs with a trigram
+# Jaccard similarity of 0.4 candidates 9 times in 10
+SIGNATURE_SIZE = 30
+BAND_SIZE = 2
+# Buckets this large come from very common trigrams and are not worth comparing
+MAX_BUCKET = 50
+# Candidates whose estimated trigram Jaccard is below this are not verified
+MIN_ESTIMATED_JACCARD = 0.25
+# Minimum SequenceMatcher ratio between compacted keys to merge two clusters
+MIN_SIMILARITY = 0.9
+# Keys shorter than this, spaces removed, only merge when identical
+MIN_FUZZY_LENGTH = 5
+
+HASH_SEED = 360
+
+
+def canonical_keys(names):
+    """Canonical key for each name, None for placeholders and missing names."""
+    keys = (pd.Series(names, dtype=object).astype('string')
+            .str.normalize('NFKC').str.casefold()
+            .str.replace('&', ' and ', regex=False)
+            .str.replace(r"[.'’]", '', regex=True)
+            .str.replace(r'[\W_]+', ' ', regex=True)
+            .str.strip()
+            .str.replace(r'^the\s+', '', regex=True)
+            .str.replace(TRAILING_SUFFIXES, '', regex=True))
+    keys = keys.where(~keys.isin(JUNK_KEYS))
+    return keys.astype(object).where(keys.notna(), None).to_numpy()
+
+
+def minhash_signatures(texts, size=SIGNATURE_SIZE, seed=HASH_SEED):
+    """MinHash signature of each text's trigram set, shape (len(texts), size).
+
+    Texts are padded with start and end markers so their first and last
+    letters weigh as much as the middle ones. Empty texts get a signature of
+    their own that never collides with another text's.
+    """
+    chars, lengths = encode(['\x02' + text + '\x03' for text in texts])
+    signatures = np.empty((len(texts), size), dtype=np.uint64)
+    # Placeholder for texts without trigrams: unique per text
+    signatures[:] = (np.arange(len(texts), dtype=np.uint64) | np.uint64(1 << 63))[:, None]
+    if chars.shape[1] < 3:
+        return signatures
+
+    grams, rows = gram_codes(chars, lengths)
+    order = np.argsort(rows, kind='stable')
+    grams, rows = grams[order].astype(np.uint64), rows[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, size, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2 ** 63, size, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for i in range(size):
+            # Multiply-shift hashing; unsigned overflow wraps, as intended
+            hashes = (grams * multipliers[i] + offsets[i]) >> np.uint64(32)
+            signatures[rows[starts], i] = np.minimum.reduceat(hashes, starts)
+    return signatures
+
+
+def candidate_pairs(signatures, band_size=BAND_SIZE, max_bucket=MAX_BUCKET):
+    """Pairs of row ids that share at least one LSH bucket, as an (n, 2) array."""
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+    for start in range(0, signatures.shape[1], band_size):
+        band = np.ascontiguousarray(signatures[:, start:start + band_size])
+        _, bucket = np.unique(band.view([('', band.dtype)] * band.shape[1]), return_inverse=True)
+        order = np.argsort(bucket.ravel(), kind='stable')
+        sizes = np.bincount(bucket.ravel())
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+        # Buckets of equal size are expanded together, one (buckets, size) block at a time
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= max_bucket)]):
+            first = starts[sizes == size]
+            members = order[first[:, None] + np.arange(size)]
+            left, right = np.triu_indices(size, k=1)
+            pairs.append(np.column_stack([members[:, left].ravel(), members[:, right].ravel()]))
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    # Pack each pair into one integer so duplicates from different bands drop in a 1-d unique
+    packed = np.unique(pairs[:, 0] * len(signatures) + pairs[:, 1])
+    return np.column_stack([packed // len(signatures), packed % len(signatures)])
+
+
+def plausible_pairs(compact, signatures, pairs):
+    """Candidate pairs that could reach MIN_SIMILARITY, checked without comparing strings.
+
+    Drops pairs with a short key, lengths too far apart for the ratio, different
+    digits ("studio 1" and "studio 2" are different organizations) or a low
+    estimated Jaccard similarity.
+    """
+    if not len(pairs):
+        return pairs
+    texts = pd.Series(compact, dtype=object)
+    lengths = texts.str.len().to_numpy()
+    digits = pd.factorize(texts.str.replace(r'\D', '', regex=True))[0]
+    left, right = pairs[:, 0], pairs[:, 1]
+    shortest = np.minimum(lengths[left], lengths[right])
+    keep = shortest >= MIN_FUZZY_LENGTH
+    keep &= 2 * shortest >= MIN_SIMILARITY * (lengths[left] + lengths[right])
+    keep &= digits[left] == digits[right]
+    pairs = pairs[keep]
+    estimated = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    return pairs[estimated >= MIN_ESTIMATED_JACCARD]
+
+
+def cluster_keys(keys):
+    """Cluster id for each distinct key; near-duplicates share an id."""
+    compact = [key.replace(' ', '') for key in keys]
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Keys that only differ in spacing are the same organization
+    first_seen = {}
+    for i, text in enumerate(compact):
+        if text in first_seen:
+            parent[find(i)] = find(first_seen[text])
+        else:
+            first_seen[text] = i
+
+    signatures = minhash_signatures(compact)
+    for i, j in plausible_pairs(compact, signatures, candidate_pairs(signatures)):
+        if find(i) != find(j) and SequenceMatcher(None, compact[i], compact[j]).ratio() >= MIN_SIMILARITY:
+            parent[find(i)] = find(j)
+    roots = np.array([find(i) for i in range(len(keys))], dtype=np.int64)
+    return pd.factorize(roots)[0]
+
+
+class Organizations:
+    """Organization cluster of every user row, with each cluster's key and name."""
+
+    def __init__(self, codes, keys, names, spellings, spelling_clusters):
+        # codes[row] indexes keys/names; -1 means no organization
+        self.codes = codes
+        self.keys = keys
+        self.names = names
+        # Every distinct raw spelling with a key, and the cluster it belongs to
+        self.spellings = spellings
+        self.spelling_clusters = spelling_clusters
+
+    def __len__(self):
+        """Number of distinct organizations that have users."""
+        return int(np.count_nonzero(np.bincount(self.codes[self.codes >= 0], minlength=len(self.keys))))
+
+    def present(self):
+        """Rows with a real organization."""
+        return self.codes >= 0
+
+    def matching(self, names):
+        """Rows whose organization mentions one of `names`.
+
+        A cluster matches when one of `names`' keys, spaces removed, is a
+        substring of its compacted key or of any of its raw spellings, case
+        folded: "Ricoh" matches "Nihon Ricoh", "RicohTheta" and
+        "theta360 (ricoh)". Each distinct cluster and spelling is checked once.
+        """
+        keys = pd.Series(self.keys, dtype=object).str.replace(' ', '', regex=False)
+        spellings = pd.Series(self.spellings, dtype=object).astype('string').str.casefold().str.replace(
+            r'[\W_]+', '', regex=True)
+        hit = np.zeros(len(self.keys) + 1, dtype=bool)
+        for key in filter(None, canonical_keys(list(names))):
+            key = key.replace(' ', '')
+            hit[:-1] |= keys.str.contains(key, regex=False).to_numpy(dtype=bool)
+            mentioned = spellings.str.contains(key, regex=False).fillna(False).to_numpy(dtype=bool)
+            hit[self.spelling_clusters[mentioned]] = True
+        return hit[self.codes]
+
+
+def normalize_organizations(organization):
+    """Clusters the organization column into canonical organizations."""
+    value_codes, values = pd.factorize(organization)
+    key_of_value = canonical_keys(values)
+    key_codes, distinct_keys = pd.factorize(pd.Series(key_of_value, dtype=object))
+    clusters = cluster_keys(list(distinct_keys)) if len(distinct_keys) else np.empty(0, dtype=np.int64)
+
+    cluster_of_value = np.full(len(values) + 1, -1, dtype=np.int64)
+    known = key_codes >= 0
+    cluster_of_value[:-1][known] = clusters[key_codes[known]]
+    codes = cluster_of_value[value_codes].astype(np.int32)
+
+    # Name each cluster after its most used spelling
+    cluster_count = int(clusters.max()) + 1 if len(clusters) else 0
+    users = np.bincount(value_codes[value_codes >= 0], minlength=len(values))
+    order = np.lexsort((-users, cluster_of_value[:-1]))
+    order = order[cluster_of_value[:-1][order] >= 0]
+    first = np.flatnonzero(np.r_[True, np.diff(cluster_of_value[:-1][order]) != 0])
+    best = order[first]
+    names = np.empty(cluster_count, dtype=object)
+    keys = np.empty(cluster_count, dtype=object)
+    names[cluster_of_value[:-1][best]] = np.asarray(values, dtype=object)[best]
+    keys[cluster_of_value[:-1][best]] = key_of_value[best]
+    clustered = cluster_of_value[:-1] >= 0
+    return Organizations(codes, keys, names, np.asarray(values, dtype=object)[clustered],
+                         cluster_of_value[:-1][clustered])
@@ -0,0 +1,191 @@
+"""Everything the dashboard derives from one version of the user table.
+
+`build_artifacts` runs the aggregation stages once, and the chart functions
+below describe each dashboard chart as `(key, draw, figsize)` so the
+Streamlit app and the offline precompute command render identical images
+under identical cache keys.
+"""
+from leads import cohorts, cube, organizations, timezones
+
+# x-axis label of the registrations chart per granularity
+PERIOD_LABELS = {"Daily": "Date", "Weekly": "Week", "Monthly": "Month", "Quarterly": "Quarter"}
+
+
+class Artifacts:
+    """Aggregates, metrics and date bounds for one data version."""
+
+    def __init__(self, version, data_cube, histograms, metrics, date_bounds, signup_cohorts):
+        self.version = version
+        self.cube = data_cube
+        self.histograms = histograms
+        self.cohorts = signup_cohorts
+        self.metrics = metrics
+        self.date_bounds = date_bounds
+
+
+def compute_metrics(data, data_cube, orgs):
+    """Headline numbers shown at the top of the dashboard.
+
+    Organizations are counted by cluster and countries by ISO code, so
+    spellings of one company or country count once.
+    """
+    return {
+        'unique_users': int(data['username'].dropna().nunique()),
+        'unique_orgs': len(orgs),
+        'countries': int((data_cube.users_per_country() > 0).sum()),
+        'total_posts_read': int(data_cube.total_posts_read),
+        'rows': len(data),
+    }
+
+
+def build_artifacts(data, version, orgs=None):
+    """Runs every aggregation stage for one data version.
+
+    `orgs` is the data's `Organizations`, normalized here when not given.
+    """
+    if orgs is None:
+        orgs = organizations.normalize_organizations(data['organization'])
+    data_cube = cube.build_cube(data)
+    created_at = data['created_at']
+    return Artifacts(
+        version,
+        data_cube,
+        timezones.build_histograms(created_at),
+        compute_metrics(data, data_cube, orgs),
+        (created_at.min().to_pydatetime(), created_at.max().to_pydatetime()),
+        cohorts.build_cohorts(data),
+    )
+
+
+def line_chart(series, title, xlabel, ylabel):
+    def draw(ax):
+        series.plot(kind='line', ax=ax, marker='o')
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+        ax.tick_params(axis='x', labelrotation=45)
+    return draw
+
+
+def bar_chart(series, title, xlabel, ylabel, grid=False, rotate=True):
+    def draw(ax):
+        series.plot(kind='bar', ax=ax)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        if grid:
+            ax.grid(True)
+        if rotate:
+            ax.tick_params(axis='x', labelrotation=45)
+    return draw
+
+
+def pie_chart(series, title):
+    def draw(ax):
+        series.plot(kind='pie', autopct='%1.1f%%', ax=ax)
+        ax.set_title(title)
+        ax.axis('equal')
+    return draw
+
+
+def heatmap(frame, title, colorbar_label, percent=False):
+    def draw(ax):
+        image = ax.imshow(frame.to_numpy(dtype=float).T, aspect='auto', cmap='viridis', interpolation='nearest')
+        colorbar = ax.figure.colorbar(image, ax=ax)
+        colorbar.set_label(colorbar_label)
+        if percent:
+            from matplotlib.ticker import PercentFormatter
+            colorbar.ax.yaxis.set_major_formatter(PercentFormatter(1.0))
+        # About a dozen month labels, on the first cohort of each stretch
+        step = max(1, len(frame) // 12)
+        ax.set_xticks(range(0, len(frame), step))
+        ax.set_xticklabels([str(month) for month in frame.index[::step]], rotation=45, ha='right')
+        ax.set_yticks(range(len(frame.columns)))
+        ax.set_yticklabels(frame.columns)
+        ax.set_title(title)
+        ax.set_xlabel('Registration Month')
+    return draw
+
+
+def registrations_chart(artifacts, start, end, granularity):
+    registrations = artifacts.cube.registrations(start, end, granularity)
+    xlabel = PERIOD_LABELS[granularity]
+    key = ('registrations', artifacts.version, granularity, start.isoformat(), end.isoformat())
+    draw = line_chart(registrations, f'{granularity} Developer Registrations', xlabel, 'Number of Registrations')
+    return key, draw, (10, 6)
+
+
+def cumulative_posts_chart(artifacts):
+    draw = line_chart(artifacts.cube.cumulative_posts_read(), 'Cumulative Posts Read Over Time',
+                      'Date', 'Total Posts Read')
+    return ('cumulative_posts', artifacts.version), draw, (10, 6)
+
+
+# Cohort heatmap value -> (matrix value, colorbar label)
+COHORT_VALUES = {
+    "Users": ('users', 'Users'),
+    "Share of cohort": ('share', 'Share of Cohort'),
+    "Average posts read": ('posts_read', 'Average Posts Read'),
+}
+
+
+def cohort_chart(artifacts, country=cohorts.ALL_COUNTRIES, value="Share of cohort"):
+    matrix_value, label = COHORT_VALUES[value]
+    frame = artifacts.cohorts.matrix(country, matrix_value)
+    draw = heatmap(frame, f'Engagement Tiers by Signup Month ({country})', label, percent=matrix_value == 'share')
+    return ('cohorts', artifacts.version, country, value), draw, (12, 5)
+
+
+def region_engagement_chart(artifacts):
+    draw = bar_chart(artifacts.cube.mean_posts_read_by_country().head(10),
+                     'Top 10 Countries by Average Engagement', 'Country', 'Average Posts Read')
+    return ('region_engagement', artifacts.version), draw, (10, 6)
+
+
+def country_counts_chart(artifacts):
+    draw = bar_chart(artifacts.cube.country_counts().head(15),
+                     'Top 15 Countries by Registration Count', 'Country', 'Number of Registrations')
+    return ('country_counts', artifacts.version), draw, (12, 6)
+
+
+def eu_chart(artifacts):
+    draw = pie_chart(artifacts.cube.eu_counts(), 'Distribution of EU vs Non-EU Developers')
+    return ('eu_counts', artifacts.version), draw, (8, 6)
+
+
+def state_counts_chart(artifacts, country='United States'):
+    draw = bar_chart(artifacts.cube.state_counts(country).head(15),
+                     'Top 15 US States by Registration Count', 'State', 'Number of Registrations')
+    return ('state_counts', artifacts.version), draw, (12, 6)
+
+
+def hourly_chart(artifacts, timezone):
+    counts = timezones.hourly_counts(artifacts.histograms[timezone])
+    draw = bar_chart(counts, f'Registrations by Hour of Day ({timezone})', f'Hour ({timezone})',
+                     'Number of Registrations', grid=True, rotate=False)
+    return ('hourly_registrations', artifacts.version, timezone), draw, (10, 6)
+
+
+def weekday_chart(artifacts, timezone):
+    counts = timezones.weekday_counts(artifacts.histograms[timezone])
+    draw = bar_chart(counts, f'Registrations by Day of Week ({timezone})', 'Day of Week',
+                     'Number of Registrations', grid=True, rotate=False)
+    return ('daily_registrations', artifacts.version, timezone), draw, (10, 6)
+
+
+def default_charts(artifacts):
+    """Every chart as the dashboard first shows it, plus all timezone and
+    granularity variants. Used to pre-render a bundle."""
+    start, end = artifacts.date_bounds
+    for granularity in cube.GRANULARITIES:
+        yield registrations_chart(artifacts, start, end, granularity)
+    yield cumulative_posts_chart(artifacts)
+    yield cohort_chart(artifacts)
+    yield region_engagement_chart(artifacts)
+    yield country_counts_chart(artifacts)
+    yield eu_chart(artifacts)
+    yield state_counts_chart(artifacts)
+    for timezone in timezones.TIMEZONE_OPTIONS:
+        yield hourly_chart(artifacts, timezone)
+        yield weekday_chart(artifacts, timezone)
@@ -0,0 +1,210 @@
+"""Headless precompute of every dashboard artifact.
+
+    python -m leads.precompute --out artifacts
+
+Runs ingestion, cleaning, aggregation and chart rendering once and writes a
+versioned bundle the Streamlit app picks up at startup:
+
+    artifacts/<version>/metrics.json      headline metrics and date bounds
+    artifacts/<version>/aggregates/*.parquet
+    artifacts/<version>/charts/*.png      with charts/manifest.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import toml
+
+from leads import charts, cohorts, communities, cube, pipeline
+from leads.timezones import TIMEZONE_OPTIONS
+
+BUNDLE_FORMAT = 4
+
+
+def histograms_frame(histograms):
+    """Long-form table of the per-timezone hour/weekday histograms."""
+    frames = []
+    for timezone, histogram in histograms.items():
+        hour, weekday = np.indices(histogram.shape)
+        frames.append(pd.DataFrame({
+            'timezone': timezone,
+            'hour': hour.ravel(),
+            'weekday': weekday.ravel(),
+            'registrations': histogram.ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def histograms_from_frame(frame):
+    histograms = {}
+    for timezone, rows in frame.groupby('timezone', sort=False):
+        histogram = np.zeros((24, 7), dtype=np.int64)
+        histogram[rows['hour'], rows['weekday']] = rows['registrations']
+        histograms[timezone] = histogram
+    return histograms
+
+
+def bundle_exists(root, version):
+    """True when a complete bundle of the current format was built for `version`.
+
+    Bundles are moved into place whole, so one with a metrics.json is complete.
+    """
+    try:
+        with open(Path(root) / str(version) / "metrics.json") as f:
+            return json.load(f).get('format') == BUNDLE_FORMAT
+    except FileNotFoundError:
+        return False
+
+
+def write_bundle(root, artifacts, chart_cache=None):
+    """Writes the bundle for `artifacts` under `root`, unless one was already built for its version.
+
+    The bundle is staged in a directory of its own and renamed into place;
+    an older bundle of the same version is renamed aside before it is
+    removed, so a reader never finds a partly deleted bundle.
+    """
+    root = Path(root)
+    target = root / artifacts.version
+    if bundle_exists(root, artifacts.version):
+        return target
+    staging = root / f".{artifacts.version}.{uuid.uuid4().hex[:12]}.tmp"
+    (staging / "aggregates").mkdir(parents=True)
+    (staging / "charts").mkdir()
+
+    artifacts.cube.facts.to_parquet(staging / "aggregates" / "cube.parquet", index=False)
+    histograms_frame(artifacts.histograms).to_parquet(staging / "aggregates" / "timezones.parquet", index=False)
+    artifacts.cohorts.to_frame().to_parquet(staging / "aggregates" / "cohorts.parquet", index=False)
+
+    chart_cache = chart_cache or charts.ChartCache()
+    manifest = []
+    for number, (key, draw, figsize) in enumerate(pipeline.default_charts(artifacts)):
+        filename = f"{number:03d}-{key[0]}.png"
+        (staging / "charts" / filename).write_bytes(chart_cache.render(key, draw, figsize=figsize))
+        manifest.append({'key': list(key), 'file': filename})
+    with open(staging / "charts" / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    start, end = artifacts.date_bounds
+    with open(staging / "metrics.json", "w") as f:
+        json.dump({
+            'format': BUNDLE_FORMAT,
+            'version': artifacts.version,
+            'built_at': datetime.now().astimezone().isoformat(),
+            'date_bounds': [start.isoformat(), end.isoformat()],
+            'metrics': artifacts.metrics,
+            'cohort_tier_edges': artifacts.cohorts.edges.tolist(),
+        }, f, indent=2)
+
+    retired = root / f".{artifacts.version}.{uuid.uuid4().hex[:12]}.old"
+    try:
+        os.replace(target, retired)
+    except FileNotFoundError:
+        retired = None
+    os.replace(staging, target)
+    if retired is not None:
+        shutil.rmtree(retired, ignore_errors=True)
+    return target
+
+
+def load_bundle(root, version, chart_cache=None):
+    """Loads the bundle built for `version`, or returns None if there isn't one.
+
+    Pre-rendered charts are put into `chart_cache` when it is given.
+    """
+    path = Path(root) / str(version)
+    try:
+        with open(path / "metrics.json") as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        return None
+    if info.get('format') != BUNDLE_FORMAT:
+        return None
+
+    facts = pd.read_parquet(path / "aggregates" / "cube.parquet")
+    histograms = histograms_from_frame(pd.read_parquet(path / "aggregates" / "timezones.parquet"))
+    artifacts = pipeline.Artifacts(
+        info['version'],
+        cube.Cube(facts),
+        {label: histograms[label] for label in TIMEZONE_OPTIONS if label in histograms},
+        info['metrics'],
+        tuple(datetime.fromisoformat(bound) for bound in info['date_bounds']),
+        cohorts.Cohorts.from_frame(pd.read_parquet(path / "aggregates" / "cohorts.parquet"),
+                                   info['cohort_tier_edges']),
+    )
+
+    if chart_cache is not None:
+        with open(path / "charts" / "manifest.json") as f:
+            for chart in json.load(f):
+                image = (path / "charts" / chart['file']).read_bytes()
+                chart_cache.put((tuple(chart['key']), "png"), image)
+    return artifacts
+
+
+def build_community(community):
+    """Refreshes one community and writes its bundle; returns (bundle path, users, whether it was built).
+
+    Module level so a worker process can run it.
+    """
+    data, version = community.load()
+    if bundle_exists(community.artifact_dir, version):
+        return Path(community.artifact_dir) / version, len(data), False
+    artifacts = pipeline.build_artifacts(data, version)
+    return write_bundle(community.artifact_dir, artifacts), len(data), True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m leads.precompute",
+        description="Build the dashboard's aggregates, charts and metrics offline."
+    )
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml",
+                        help="secrets file with the [data], [discourse] or [communities] settings (default: %(default)s)")
+    parser.add_argument("--out", default=None,
+                        help="bundle directory when building one community (default: its artifact_dir)")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help="Parquet snapshot directory when building one community (default: its snapshot_dir)")
+    parser.add_argument("--community", action="append", default=None,
+                        help="community to build, repeatable (default: every configured community)")
+    args = parser.parse_args(argv)
+
+    configured = communities.communities_from_config(toml.load(args.secrets))
+    unknown = [name for name in args.community or () if name not in configured]
+    if unknown:
+        parser.error(f"unknown community {', '.join(map(repr, unknown))}; configured: {', '.join(configured)}")
+    selected = {name: configured[name] for name in (args.community or configured)}
+    if len(selected) > 1 and (args.out or args.snapshot_dir):
+        parser.error("--out and --snapshot-dir need a single community; pick one with --community")
+    if len(selected) == 1:
+        (community,) = selected.values()
+        if args.snapshot_dir:
+            community.snapshot_dir = args.snapshot_dir
+        if args.out:
+            community.artifact_dir = args.out
+
+    started = time.perf_counter()
+    # One worker process per community, so several forums build side by side
+    with communities.process_pool(len(selected)) as pool:
+        futures = {name: pool.submit(build_community, community) for name, community in selected.items()}
+        failed = 0
+        for name, future in futures.items():
+            try:
+                target, users, built = future.result()
+            except Exception as exc:
+                print(f"Failed to build {name}: {exc}", file=sys.stderr)
+                failed += 1
+            else:
+                print(f"{'Wrote' if built else 'Up to date:'} {target} ({users} users)")
+    print(f"Built {len(selected) - failed} of {len(selected)} communities in {time.perf_counter() - started:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
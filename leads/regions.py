@@ -0,0 +1,97 @@
+"""Regions for the map filter, materialized once per data version.
+
+A region is a rule over the users' ISO country codes:
+
+    {"countries": ["Japan", "KR"]}     one of these countries (names, aliases or ISO codes)
+    {"eu": true}                       an EU member state
+    {"regions": ["Europe"]}            a country on one of these continents
+
+Countries, membership and continents come from the bundled country table
+(`leads.countries`), and unknown names are rejected when the regions are
+configured. A rule may have several keys, in which case a user matching
+any of them is in the region. Extra regions come from the `[regions]` table
+in secrets, where a bare list is short for `countries`:
+
+    [regions]
+    Nordics = ["Sweden", "Norway", "Denmark", "Finland", "Iceland"]
+"""
+import numpy as np
+
+from leads import countries
+
+ALL_REGIONS = "All Regions"
+
+DEFAULT_REGIONS = {
+    "United States": {"countries": ["United States"]},
+    "European Union": {"eu": True},
+    "Japan": {"countries": ["Japan"]},
+    "India": {"countries": ["India"]},
+    "APAC": {"countries": [
+        "Japan", "China", "India", "Korea", "Taiwan", "Hong Kong", "Singapore", "Australia",
+        "New Zealand", "Indonesia", "Thailand", "Viet Nam", "Vietnam", "Philippines", "Malaysia",
+    ]},
+    "LATAM": {"countries": [
+        "Mexico", "Brazil", "Argentina", "Chile", "Colombia", "Peru", "Uruguay", "Ecuador",
+        "Venezuela", "Bolivia", "Paraguay", "Costa Rica", "Panama", "Guatemala",
+    ]},
+}
+
+RULE_KEYS = {'countries', 'eu', 'regions'}
+
+
+def regions_from_config(config, defaults=DEFAULT_REGIONS):
+    """The default regions updated with the configured ones, in that order."""
+    regions = {name: dict(rule) for name, rule in defaults.items()}
+    for name, rule in config.items():
+        if isinstance(rule, (list, tuple)):
+            rule = {'countries': list(rule)}
+        rule = dict(rule)
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"Region {name!r} has unknown keys: {', '.join(sorted(unknown))}")
+        try:
+            rule_codes(rule)
+        except ValueError as exc:
+            raise ValueError(f"Region {name!r}: {exc}") from None
+        regions[name] = rule
+    return regions
+
+
+def rule_codes(rule):
+    """ISO numeric codes of every country the rule covers."""
+    codes = [countries.resolve(rule.get('countries', []))]
+    if rule.get('eu'):
+        codes.append(countries.eu_codes())
+    if rule.get('regions'):
+        codes.append(countries.region_codes(rule['regions']))
+    return np.unique(np.concatenate(codes))
+
+
+def region_mask(country_codes, rule):
+    """Rows whose ISO country code is covered by `rule`."""
+    return countries.covered(rule_codes(rule))[country_codes]
+
+
+class RegionPartitions:
+    """Sorted row positions of each region's users, with and without a location."""
+
+    def __init__(self, country_codes, has_coordinates, regions=DEFAULT_REGIONS):
+        self.names = [ALL_REGIONS, *regions]
+        self._rows = {ALL_REGIONS: np.flatnonzero(has_coordinates)}
+        self._members = {ALL_REGIONS: np.arange(len(country_codes))}
+        for name, rule in regions.items():
+            mask = region_mask(country_codes, rule)
+            self._members[name] = np.flatnonzero(mask)
+            self._rows[name] = np.flatnonzero(mask & has_coordinates)
+
+    def rows(self, name):
+        """Row positions on the map for region `name`, ascending."""
+        return self._rows[name]
+
+    def members(self, name):
+        """Row positions of every user in region `name`, including those without a location."""
+        return self._members[name]
+
+    def users(self, name):
+        """Users in region `name`, including those without a location."""
+        return len(self._members[name])
@@ -0,0 +1,69 @@
+"""Explicit column types for the user table.
+
+CSV parsing leaves most columns as Python object strings and 64-bit numbers.
+Applying this schema at ingestion turns repeated location and organization
+strings into categoricals, unique strings into Arrow-backed strings, counts
+into narrow (nullable) integers, coordinates into float32, the EU flag into a
+real boolean and `created_at` into a UTC timestamp.
+"""
+import pandas as pd
+
+USER_SCHEMA = {
+    'user_id': 'Int32',
+    'username': 'string[pyarrow]',
+    'name': 'string[pyarrow]',
+    'organization': 'category',
+    'country': 'category',
+    'last_ip_country': 'category',
+    'last_ip_state': 'category',
+    'last_ip_city': 'category',
+    'last_ip_latitude': 'float32',
+    'last_ip_longitude': 'float32',
+    'registration_ip_latitude': 'float32',
+    'registration_ip_longitude': 'float32',
+    'last_ip_is_eu_member': 'boolean',
+    'created_at': 'datetime64[ns, UTC]',
+    'posts_read': 'Int32',
+}
+
+INTEGER_TYPES = {'Int8', 'Int16', 'Int32', 'Int64', 'UInt8', 'UInt16', 'UInt32', 'UInt64'}
+BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def to_boolean(values):
+    """Nullable booleans from bools, 0/1 or 'true'/'false' strings."""
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype('boolean')
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('Float64').astype('boolean')
+    lowered = values.astype('string').str.strip().str.lower()
+    return lowered.map(BOOLEAN_STRINGS).astype('boolean')
+
+
+def apply_schema(data, schema=USER_SCHEMA):
+    """Returns `data` with every schema column that it has converted."""
+    data = data.copy(deep=False)
+    for column, dtype in schema.items():
+        if column not in data.columns:
+            continue
+        values = data[column]
+        if dtype == 'boolean':
+            data[column] = to_boolean(values)
+        elif dtype in INTEGER_TYPES:
+            data[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+        elif dtype.startswith('datetime64'):
+            data[column] = pd.to_datetime(values, utc=True)
+        else:
+            data[column] = values.astype(dtype)
+    return data
+
+
+def memory_report(before, after):
+    """Per-column deep memory use in bytes before and after typing, plus totals."""
+    report = pd.DataFrame({
+        'before': before.memory_usage(index=False, deep=True),
+        'after': after.memory_usage(index=False, deep=True),
+    }).fillna(0).astype('int64')
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['before'] / report['after']).round(1)
+    return report
@@ -0,0 +1,113 @@
+"""Case-insensitive substring search backed by a trigram index.
+
+Each indexed column is factorized into its distinct values, and every
+distinct value is indexed under the trigrams it contains. A query intersects
+the posting lists of its own trigrams to get a small candidate set, confirms
+the candidates with a plain substring test, and maps the matching values
+back to row positions with one NumPy gather. No query scans the rows as
+strings.
+"""
+import numpy as np
+import pandas as pd
+
+SEARCH_FIELDS = ('username', 'country', 'organization')
+GRAM = 3
+# Values are encoded in chunks to bound the size of the character matrix
+CHUNK_SIZE = 100_000
+
+
+def gram_codes(chars, lengths):
+    """Packs every trigram of a `(values, width)` code point matrix into an int64.
+
+    Unicode code points fit in 21 bits, so three of them fit in one int64.
+    Returns the codes and the row each one came from, in row order.
+    """
+    chars = chars.astype(np.int64)
+    codes = (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+    valid = np.arange(codes.shape[1]) < (lengths - 2)[:, None]
+    rows = np.broadcast_to(np.arange(len(chars))[:, None], codes.shape)
+    return codes[valid], rows[valid]
+
+
+def encode(texts):
+    """Code point matrix and lengths for a list of strings."""
+    array = np.array(texts, dtype=str)
+    width = max(array.dtype.itemsize // 4, 1)
+    return array.view(np.uint32).reshape(len(array), width), np.char.str_len(array)
+
+
+class SubstringIndex:
+    """Trigram index over the distinct values of one column."""
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        self.size = len(codes)
+        # Missing values get code -1, which points at the trailing "no match" slot
+        self._codes = codes
+        self._lowered = pd.Series([str(value).lower() for value in uniques], dtype=object)
+
+        grams, value_ids = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for start in range(0, len(self._lowered), CHUNK_SIZE):
+            chars, lengths = encode(self._lowered.iloc[start:start + CHUNK_SIZE].tolist())
+            if chars.shape[1] < GRAM:
+                continue
+            chunk_grams, rows = gram_codes(chars, lengths)
+            grams.append(chunk_grams)
+            value_ids.append(rows + start)
+        grams = np.concatenate(grams)
+        value_ids = np.concatenate(value_ids).astype(np.int32)
+
+        # Value ids are already ascending, so a stable sort by gram leaves
+        # each posting list sorted; drop repeats of a gram within one value.
+        order = np.argsort(grams, kind='stable')
+        grams, value_ids = grams[order], value_ids[order]
+        keep = np.ones(len(grams), dtype=bool)
+        keep[1:] = (grams[1:] != grams[:-1]) | (value_ids[1:] != value_ids[:-1])
+        self._grams = grams[keep]
+        self._value_ids = value_ids[keep]
+
+    def postings(self, gram):
+        """Sorted ids of the distinct values containing one trigram code."""
+        start = np.searchsorted(self._grams, gram, side='left')
+        stop = np.searchsorted(self._grams, gram, side='right')
+        return self._value_ids[start:stop]
+
+    def matching_values(self, query):
+        """Ids of the distinct values that contain `query`, ignoring case."""
+        query = query.lower()
+        if len(query) < GRAM:
+            matches = self._lowered.str.contains(query, regex=False).to_numpy()
+            return np.flatnonzero(matches)
+
+        chars, lengths = encode([query])
+        query_grams = np.unique(gram_codes(chars, lengths)[0])
+        lists = sorted((self.postings(gram) for gram in query_grams), key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        if len(query) == GRAM:
+            return candidates
+        # Having all the trigrams doesn't guarantee the substring, so confirm
+        confirmed = self._lowered.iloc[candidates].str.contains(query, regex=False).to_numpy()
+        return candidates[confirmed]
+
+    def mask(self, query, rows=None):
+        """Boolean array, True where the value contains `query`.
+
+        Covers every row, or only the given row positions (in their order),
+        so narrowing an existing selection costs its size, not the table's.
+        """
+        matched = np.zeros(len(self._lowered) + 1, dtype=bool)
+        matched[self.matching_values(query)] = True
+        return matched[self._codes if rows is None else self._codes[rows]]
+
+
+def build_search_index(data, fields=SEARCH_FIELDS):
+    """One `SubstringIndex` per field, keyed by column name.
+
+    Row positions refer to `data` as it is, so `data` should have a default
+    `RangeIndex` for positions and labels to agree.
+    """
+    return {field: SubstringIndex(data[field]) for field in fields}
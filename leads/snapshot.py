@@ -0,0 +1,245 @@
+"""Local Parquet snapshot of the cleaned user table.
+
+The snapshot is a directory of Parquet part files plus a small JSON
+watermark. Startup reads the parts back memory-mapped instead of downloading
+and parsing the CSV exports. Sources that download the whole table (the sheet
+exports) replace the snapshot whenever its content digest changes, so edited
+users are picked up too; incremental sources (the Discourse sync) append a new
+part holding only the users that are newer than the watermark.
+
+The watermark lists the part files that make up the snapshot and is written
+last, with an atomic rename, so a reader sees either the old parts or the new
+ones, never a half-written set. Parts get unique names and are only deleted
+once the watermark no longer lists them. Writers (the app's background
+refresh and `python -m leads.precompute` may share a directory) take an
+exclusive file lock, so one writer's check of the watermark and its update
+are not interleaved with another's.
+"""
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from leads.cleaning import refresh_countries
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+WATERMARK_FILE = "_watermark.json"
+LOCK_FILE = ".lock"
+# A reader retries when a writer removed the parts it was about to read
+READ_ATTEMPTS = 3
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on `path` for the enclosed block; other writers wait for it.
+
+    A no-op where `fcntl` is unavailable.
+    """
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def unique_name(prefix, suffix):
+    return f"{prefix}-{uuid.uuid4().hex[:12]}{suffix}"
+
+
+def arrow_strings(arrow_type):
+    if arrow_type in (pa.string(), pa.large_string()):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def value_type(arrow_type):
+    # Parquet reads dictionary indices back as int32, so only compare the values
+    if pa.types.is_dictionary(arrow_type):
+        return arrow_type.value_type
+    return arrow_type
+
+
+def changed_types(incoming, stored):
+    """True if a column's type differs from the stored one, ignoring all-null columns."""
+    for field in incoming:
+        stored_type = value_type(stored.field(field.name).type)
+        if value_type(field.type) != stored_type and not pa.types.is_null(field.type):
+            return True
+    return False
+
+
+class SnapshotStore:
+    """Parquet store keyed by a `user_id`/`created_at` watermark and, for full exports, a content digest."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def parts(self, watermark=None):
+        """The part files of the snapshot described by `watermark` (default: the current one)."""
+        if watermark is None:
+            watermark = self.watermark()
+        if watermark is not None and 'parts' in watermark:
+            return [self.path / name for name in watermark['parts']]
+        # Snapshots written before the watermark listed its parts
+        return sorted(self.path.glob("part-*.parquet"))
+
+    def exists(self):
+        watermark = self.watermark()
+        return watermark is not None and bool(self.parts(watermark))
+
+    def watermark(self):
+        """Returns the stored watermark dict, or None for an empty store."""
+        try:
+            with open(self.path / WATERMARK_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def version_of(watermark):
+        if watermark is None:
+            return None
+        # Used in file names, so keep it to digits, hex and dashes
+        if watermark.get('digest'):
+            return f"{watermark['rows']}-{watermark['digest']}"
+        created_at = int(pd.Timestamp(watermark['created_at']).timestamp())
+        return f"{watermark['rows']}-{watermark['user_id']}-{created_at}"
+
+    @property
+    def version(self):
+        return self.version_of(self.watermark())
+
+    def read(self):
+        """Reads all parts back into one DataFrame using memory-mapped IO.
+
+        Arrow strings stay Arrow-backed instead of becoming Python objects.
+        Countries of snapshots written by older versions are matched again.
+        """
+        return self.load_or_raise()[0]
+
+    def load(self):
+        """Returns `(data, version)` of one consistent snapshot, or None when there is no snapshot yet."""
+        if not self.exists():
+            return None
+        return self.load_or_raise()
+
+    def load_or_raise(self):
+        """`(data, version)` of the current snapshot; raises FileNotFoundError when there is none."""
+        for attempt in range(READ_ATTEMPTS):
+            watermark = self.watermark()
+            parts = self.parts(watermark)
+            if watermark is None or not parts:
+                raise FileNotFoundError(f"No snapshot in {self.path}")
+            try:
+                table = pq.read_table(parts, memory_map=True)
+            except FileNotFoundError:
+                # A writer swapped in new parts after the watermark was read
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+                continue
+            return refresh_countries(table.to_pandas(types_mapper=arrow_strings)), self.version_of(watermark)
+
+    @contextmanager
+    def _writing(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path / LOCK_FILE):
+            yield
+
+    def write(self, data, digest=None):
+        """Replaces the whole snapshot with `data`, recording the `digest` of its source if given."""
+        with self._writing():
+            return self._write(data, digest)
+
+    def _write(self, data, digest=None):
+        old_parts = self.parts()
+        part = self._write_part(pa.Table.from_pandas(data, preserve_index=False), 0)
+        self._save_watermark(data, len(data), [part], digest)
+        self._remove(old_parts)
+        return len(data)
+
+    def replace(self, data, digest):
+        """Rewrites the snapshot with `data` unless it was written from a source with the same `digest`.
+
+        For sources that always download the full table: updated users are
+        replaced rather than kept at their first-seen values. Returns the
+        number of rows written, 0 when the content is unchanged.
+        """
+        with self._writing():
+            watermark = self.watermark()
+            if watermark is not None and watermark.get('digest') == digest and self.parts(watermark):
+                return 0
+            return self._write(data, digest)
+
+    def append(self, data):
+        """Appends the rows of `data` newer than the watermark.
+
+        `data` is the full cleaned table; only users with a larger `user_id`
+        or a later `created_at` than the stored watermark are written. Falls
+        back to a full rewrite when the columns or their types no longer
+        match the stored schema. Returns the number of rows written.
+        """
+        with self._writing():
+            watermark = self.watermark()
+            parts = self.parts(watermark)
+            if watermark is None or not parts:
+                return self._write(data)
+
+            newer = (
+                (data['user_id'] > watermark['user_id'])
+                | (data['created_at'] > pd.Timestamp(watermark['created_at']))
+            )
+            new_rows = data[newer]
+            if new_rows.empty:
+                return 0
+
+            schema = pq.read_schema(parts[0])
+            try:
+                table = pa.Table.from_pandas(new_rows, preserve_index=False).select(schema.names)
+                if table.num_columns != len(data.columns) or changed_types(table.schema, schema):
+                    return self._write(data)
+                table = table.cast(schema)
+            except (KeyError, ValueError, pa.ArrowException):
+                return self._write(data)
+
+            part = self._write_part(table, len(parts))
+            self._save_watermark(data, watermark['rows'] + len(new_rows), [p.name for p in parts] + [part])
+            return len(new_rows)
+
+    def _write_part(self, table, number):
+        """Writes a part under a new unique name and returns that name."""
+        name = unique_name(f"part-{number:05d}", ".parquet")
+        tmp = self.path / unique_name(".part", ".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.path / name)
+        return name
+
+    def _remove(self, parts):
+        """Deletes parts the watermark no longer lists."""
+        for part in parts:
+            part.unlink(missing_ok=True)
+
+    def _save_watermark(self, data, rows, parts, digest=None):
+        watermark = {
+            'rows': int(rows),
+            'user_id': int(data['user_id'].max()),
+            'created_at': data['created_at'].max().isoformat(),
+            'parts': list(parts),
+        }
+        if digest is not None:
+            watermark['digest'] = digest
+        tmp = self.path / unique_name(WATERMARK_FILE, ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(watermark, f)
+        os.replace(tmp, self.path / WATERMARK_FILE)
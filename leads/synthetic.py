@@ -0,0 +1,149 @@
+"""Synthetic Discourse user exports for load testing the pipeline.
+
+    python -m leads.synthetic --rows 100000 --out .cache/synthetic
+
+Writes the rows as one CSV per Google Sheet (`sheet1.csv`, ...) with the
+columns and value formats of the real admin export, so they can go through
+the same ingestion and cleaning as production data.
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Forum sizes to test against: roughly today, 10x and 100x
+SIZES = (10_000, 100_000, 1_000_000)
+
+COLUMNS = ['user_id', 'username', 'name', 'organization', 'created_at', 'posts_read',
+           'last_ip_country', 'last_ip_state', 'last_ip_city', 'last_ip_latitude',
+           'last_ip_longitude', 'last_ip_is_eu_member']
+
+# (country, share of users, EU member, latitude, longitude, [(state, city), ...])
+COUNTRIES = [
+    ('United States', 0.30, False, 39.8, -98.6, [('California', 'San Jose'), ('Texas', 'Austin'),
+                                                 ('New York', 'New York'), ('Washington', 'Seattle')]),
+    ('Japan', 0.16, False, 35.7, 139.7, [('Tokyo', 'Tokyo'), ('Osaka', 'Osaka'), ('Kanagawa', 'Yokohama')]),
+    ('India', 0.09, False, 19.1, 72.9, [('Maharashtra', 'Mumbai'), ('Karnataka', 'Bengaluru')]),
+    ('Germany', 0.06, True, 52.5, 13.4, [('Berlin', 'Berlin'), ('Bavaria', 'Munich')]),
+    ('France', 0.04, True, 48.9, 2.4, [('Ile-de-France', 'Paris')]),
+    ('Italy', 0.03, True, 41.9, 12.5, [('Lazio', 'Rome')]),
+    ('United Kingdom', 0.05, False, 51.5, -0.1, [('England', 'London')]),
+    ('Canada', 0.04, False, 43.7, -79.4, [('Ontario', 'Toronto'), ('British Columbia', 'Vancouver')]),
+    ('Brazil', 0.03, False, -23.6, -46.6, [('Sao Paulo', 'Sao Paulo')]),
+    ('Korea, Republic of', 0.03, False, 37.6, 127.0, [('Seoul', 'Seoul')]),
+    ('China', 0.04, False, 31.2, 121.5, [('Shanghai', 'Shanghai')]),
+    ('Australia', 0.02, False, -33.9, 151.2, [('New South Wales', 'Sydney')]),
+    ('Netherlands', 0.02, True, 52.4, 4.9, [('North Holland', 'Amsterdam')]),
+    (None, 0.09, None, np.nan, np.nan, [(None, None)]),
+]
+
+# Most people leave the field empty; the rest mix real names, spelling
+# variants of the same company and the placeholders cleaning drops
+ORGANIZATIONS = [
+    (None, 0.62), ('Ricoh', 0.03), ('RICOH Company, Ltd.', 0.01), ('Oppkey', 0.01),
+    ('Acme Inc', 0.02), ('ACME, Inc.', 0.01), ('Insta360', 0.02), ('Matterport', 0.02),
+    ('Foo GmbH', 0.01), ('Bar Ltd', 0.01), ('University of Tokyo', 0.02),
+    ('Stanford University', 0.01), ('freelance', 0.03), ('x', 0.04), ('none', 0.04),
+    ('--', 0.02), (' ', 0.02), ('tests', 0.01), ('none none', 0.01), ('a', 0.04),
+]
+
+USERNAME_PREFIXES = ['dev', 'theta', 'pano', 'vr', 'cam', 'maker', 'photo', 'jp', 'user', 'studio']
+
+# Registrations start in 2015 and grow year on year
+FIRST_REGISTRATION = pd.Timestamp('2015-06-01', tz='UTC')
+LAST_REGISTRATION = pd.Timestamp('2025-06-01', tz='UTC')
+
+
+def pick(rng, choices, weights, rows):
+    """Returns `rows` indexes into `choices` drawn with the given weights."""
+    weights = np.asarray(weights, dtype=float)
+    return rng.choice(len(choices), size=rows, p=weights / weights.sum())
+
+
+def generate_users(rows, seed=0, first_user_id=1):
+    """Returns `rows` synthetic users shaped like the raw Discourse export.
+
+    Values come back as the CSV would give them: created_at is a
+    "YYYY-MM-DD HH:MM:SS UTC" string and missing values are None or NaN.
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(first_user_id, first_user_id + rows)
+
+    prefixes = np.array(USERNAME_PREFIXES, dtype=object)[rng.integers(0, len(USERNAME_PREFIXES), rows)]
+    usernames = pd.Series(prefixes) + pd.Series(user_ids.astype(str))
+
+    country = pick(rng, COUNTRIES, [c[1] for c in COUNTRIES], rows)
+    names = np.array([c[0] for c in COUNTRIES], dtype=object)
+    is_eu = np.array([c[2] for c in COUNTRIES], dtype=object)
+    latitude = np.array([c[3] for c in COUNTRIES])[country] + rng.normal(0, 1.5, rows)
+    longitude = np.array([c[4] for c in COUNTRIES])[country] + rng.normal(0, 1.5, rows)
+
+    # One (state, city) per row from the places listed for its country
+    places = [(i, state, city) for i, c in enumerate(COUNTRIES) for state, city in c[5]]
+    place_country = np.array([p[0] for p in places])
+    starts = np.searchsorted(place_country, np.arange(len(COUNTRIES)))
+    counts = np.bincount(place_country, minlength=len(COUNTRIES))
+    place = starts[country] + (rng.random(rows) * counts[country]).astype(int)
+
+    organization = pick(rng, ORGANIZATIONS, [o[1] for o in ORGANIZATIONS], rows)
+
+    # Growth: registration time drawn from a quadratic ramp over the date range
+    span = (LAST_REGISTRATION - FIRST_REGISTRATION).total_seconds()
+    offsets = np.sort(np.sqrt(rng.random(rows)) * span).astype('int64')
+    created_at = FIRST_REGISTRATION.to_datetime64() + offsets.astype('timedelta64[s]')
+    created_at = pd.Series(np.datetime_as_string(created_at, unit='s')).str.replace('T', ' ') + ' UTC'
+
+    # Heavy tail: most people read a handful of posts, a few read thousands
+    posts_read = np.floor(rng.lognormal(2.5, 1.6, rows)).astype('int64')
+    posts_read[rng.random(rows) < 0.15] = 0
+
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'username': usernames,
+        'name': 'Name ' + pd.Series(user_ids.astype(str)),
+        'organization': np.array([o[0] for o in ORGANIZATIONS], dtype=object)[organization],
+        'created_at': created_at,
+        'posts_read': posts_read,
+        'last_ip_country': names[country],
+        'last_ip_state': np.array([p[1] for p in places], dtype=object)[place],
+        'last_ip_city': np.array([p[2] for p in places], dtype=object)[place],
+        'last_ip_latitude': latitude.round(4),
+        'last_ip_longitude': longitude.round(4),
+        'last_ip_is_eu_member': is_eu[country],
+    }, columns=COLUMNS)
+
+
+def split_exports(data, parts=3):
+    """Splits the users into consecutive chunks, one per Google Sheet."""
+    bounds = np.linspace(0, len(data), parts + 1).astype(int)
+    return [data.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def write_exports(data, directory, parts=3):
+    """Writes sheet1.csv ... sheetN.csv and returns their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for number, part in enumerate(split_exports(data, parts), start=1):
+        path = directory / f"sheet{number}.csv"
+        part.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Discourse user exports.")
+    parser.add_argument("--rows", type=int, default=SIZES[0])
+    parser.add_argument("--out", default=".cache/synthetic")
+    parser.add_argument("--parts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = generate_users(args.rows, seed=args.seed)
+    for path in write_exports(data, args.out, args.parts):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
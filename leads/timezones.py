@@ -0,0 +1,86 @@
+"""Registration hour/weekday histograms for the dashboard's timezones.
+
+Instead of converting the whole `created_at` column with `tz_convert` on
+every rerun, each timezone's UTC offsets are looked up from its pytz
+transition table with a binary search over the UTC epoch seconds, and the
+resulting 24x7 hour-by-weekday counts are built once per data version.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# Define timezone options
+TIMEZONE_OPTIONS = {
+    "UTC": "UTC",
+    "United States (Pacific)": "America/Los_Angeles",
+    "United States (Mountain)": "America/Denver",
+    "United States (Central)": "America/Chicago",
+    "United States (Eastern)": "America/New_York",
+    "Japan": "Asia/Tokyo",
+    "India": "Asia/Kolkata",
+    "United Kingdom": "Europe/London",
+    "European Union (Central)": "Europe/Paris",
+    "Australia (Sydney)": "Australia/Sydney"
+}
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+# 1970-01-01 was a Thursday; weekdays count from Monday = 0
+EPOCH_WEEKDAY = 3
+
+
+def transition_table(tz_name):
+    """Returns `(starts, offsets)`: UTC epoch seconds at which each UTC offset
+    (in seconds) takes effect. Fixed-offset zones have a single entry."""
+    tz = pytz.timezone(tz_name)
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if not transitions:
+        offset = tz.utcoffset(datetime(2000, 1, 1)) or pytz.utc.utcoffset(None)
+        return np.array([np.iinfo(np.int64).min]), np.array([int(offset.total_seconds())])
+    starts = np.array(transitions, dtype='datetime64[s]').astype(np.int64)
+    offsets = np.array([int(info[0].total_seconds()) for info in tz._transition_info])
+    return starts, offsets
+
+
+def utc_offsets(epochs, tz_name):
+    """UTC offset in seconds for each UTC epoch second in `epochs`."""
+    starts, offsets = transition_table(tz_name)
+    index = np.searchsorted(starts, epochs, side='right') - 1
+    return offsets[np.clip(index, 0, None)]
+
+
+def epoch_seconds(created_at):
+    """UTC epoch seconds of the non-missing timestamps in `created_at`."""
+    created_at = created_at.dropna()
+    if created_at.dt.tz is not None:
+        created_at = created_at.dt.tz_convert('UTC').dt.tz_localize(None)
+    return created_at.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def hour_weekday_histogram(epochs, tz_name):
+    """24x7 registration counts by local hour (rows) and weekday (columns)."""
+    local = epochs + utc_offsets(epochs, tz_name)
+    hour = (local // SECONDS_PER_HOUR) % 24
+    weekday = (local // SECONDS_PER_DAY + EPOCH_WEEKDAY) % 7
+    return np.bincount(hour * 7 + weekday, minlength=24 * 7).reshape(24, 7)
+
+
+def build_histograms(created_at, timezones=TIMEZONE_OPTIONS):
+    """Histograms for every timezone option, keyed by its display label."""
+    epochs = epoch_seconds(created_at)
+    return {label: hour_weekday_histogram(epochs, name) for label, name in timezones.items()}
+
+
+def hourly_counts(histogram):
+    """Registrations per local hour, omitting hours with none."""
+    counts = pd.Series(histogram.sum(axis=1), index=pd.RangeIndex(24, name='hour'))
+    return counts[counts > 0]
+
+
+def weekday_counts(histogram):
+    """Registrations per local weekday, Monday first."""
+    return pd.Series(histogram.sum(axis=0), index=pd.Index(DAY_ORDER, name='day_of_week'))